@@ -2,14 +2,19 @@ import asyncio
 from aiogram import Bot, Dispatcher
 from aiogram.types import Message
 from aiogram.filters import Command, CommandStart
-from llm_handler import get_gpt4_response, get_gpt3_response, get_qwen_response
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from llm_handler import (get_response, get_hedged_response, stream_response, StreamInterruptedError, response_cache,
+                         scheduler, hedge_stats, coalesce_stats, start_http_client, close_http_client)
 from config import get_config
+from webhook import run_webhook, run_workers
 
 config = get_config()
 bot = Bot(token=config["tg_token"])
 dp = Dispatcher()
 
 current_model = "gpt4"
+MAX_MESSAGE_LEN = 4000
+INTERRUPTED_NOTE = "\n\n[Answer interrupted: error on API server side.]"
 
 @dp.message(CommandStart())
 async def start_command(message: Message) -> None:
@@ -19,6 +24,7 @@ async def start_command(message: Message) -> None:
                          "/setmodel gpt4 - choose GPT-4o\n"
                          "/setmodel gpt3 - choose GPT-3\n"
                          "/setmodel qwen - выбрать Qwen3-8B\n"
+                         "/fresh <request> - ask again without cached answer\n"
                          "Send request, like 'Recommend a movie like Interstellar'.")
 
 @dp.message(Command("setmodel"))
@@ -32,27 +38,135 @@ async def set_model(message: Message) -> None:
     else:
         await message.answer("Unknown model. Use /setmodel gpt4/gpt3/qwen.")
 
+@dp.message(Command("llmstats"))
+async def llm_stats(message: Message) -> None:
+    """Обработчик команды /llmstats со статистикой кэша ответов и очередей к моделям"""
+    lines = []
+    if response_cache is None:
+        lines.append("Response cache is disabled.")
+    else:
+        stats = await response_cache.stats()
+        lines += [f"Cache hit rate: {stats['hit_rate']:.1%}",
+                  f"Memory hits: {stats['memory_hits']}, disk hits: {stats['disk_hits']}, "
+                  f"misses: {stats['misses']}, bypassed: {stats['bypassed']}",
+                  f"Size: {stats['memory_size']} in memory, {stats['disk_size']} on disk"]
+    for backend, stats in scheduler.stats().items():
+        lines.append(f"{backend}: {stats['active']} active, {stats['waiting']} waiting, "
+                     f"{stats['completed']} done, {stats['failed']} failed, {stats['rejected']} rejected, "
+                     f"{stats['retries']} retries, queue p50/p95 {stats['queue_p50']:.2f}/{stats['queue_p95']:.2f}s")
+    if config["llm_coalesce"]:
+        lines.append(f"Upstream requests: {coalesce_stats['upstream']}, "
+                     f"coalesced with in-flight: {coalesce_stats['coalesced']}")
+    if config["llm_hedge"]:
+        wins = ", ".join(f"{backend} {count}" for backend, count in hedge_stats["wins"].items()) or "none"
+        lines.append(f"Hedged {hedge_stats['hedged']} of {hedge_stats['requests']} requests, wins: {wins}, "
+                     f"saved ~{hedge_stats['saved_seconds']:.1f}s")
+    await message.answer("\n".join(lines))
+
+@dp.message(Command("fresh"))
+async def fresh_query(message: Message) -> None:
+    """Обработчик команды /fresh: запрос к модели в обход кэша ответов"""
+    query = message.text.partition(" ")[2].strip()
+    if not query:
+        await message.answer("Usage: /fresh Recommend a movie like Interstellar")
+        return
+    await answer_query(message, query, use_cache=False)
+
 @dp.message()
 async def handle_query(message: Message) -> None:
-    query = message.text.strip()
-    if current_model == "qwen":
-        response = await get_qwen_response(query)
-    elif current_model == "gpt4":
-        response = await get_gpt4_response(query)
+    await answer_query(message, message.text.strip())
+
+async def answer_query(message: Message, query: str, use_cache: bool = True) -> None:
+    """
+    Запрос к текущей модели и отправка ответа частями
+
+    :param message: Сообщение пользователя.
+    :param query: Текст запроса.
+    :param use_cache: Использовать ли кэш ответов.
+    """
+    if current_model == "qwen" and config["qwen_streaming"]:
+        await answer_streaming(message, query, use_cache)
+        return
+    if config["llm_hedge"]:
+        response = await get_hedged_response(current_model, query, use_cache=use_cache)
     else:
-        response = await get_gpt3_response(query)
+        response = await get_response(current_model, query, use_cache=use_cache)
     if response:
-        max_len = 4000
+        max_len = MAX_MESSAGE_LEN
         parts = [response[i:i+max_len] for i in range(0, len(response), max_len)]
         for part in parts:
             await message.answer(part)
     else:
         await message.answer("Error on API server side.")
 
+async def edit_message(sent: Message, text: str) -> None:
+    """
+    Изменение отправленного сообщения без падения на ограничениях Telegram
+
+    :param sent: Сообщение бота.
+    :param text: Новый текст.
+    """
+    try:
+        await sent.edit_text(text)
+    except TelegramRetryAfter as err:
+        await asyncio.sleep(err.retry_after)
+        await sent.edit_text(text)
+    except TelegramBadRequest as err:
+        if "message is not modified" not in str(err):
+            raise
+
+async def answer_streaming(message: Message, query: str, use_cache: bool = True) -> None:
+    """
+    Потоковый ответ: первое сообщение отправляется с первым фрагментом и
+    дополняется не чаще раза в stream_edit_interval секунд, в конце ответ
+    разбивается на части по MAX_MESSAGE_LEN символов; если поток оборвался,
+    к показанному тексту добавляется пометка INTERRUPTED_NOTE
+
+    :param message: Сообщение пользователя.
+    :param query: Текст запроса.
+    :param use_cache: Использовать ли кэш ответов.
+    """
+    loop = asyncio.get_running_loop()
+    response, sent, shown, last_edit = "", None, "", 0.0
+    try:
+        async for text in stream_response(current_model, query, use_cache=use_cache):
+            response += text
+            if sent is None:
+                shown = response[:MAX_MESSAGE_LEN]
+                sent = await message.answer(shown)
+                last_edit = loop.time()
+            elif loop.time() - last_edit >= config["stream_edit_interval"] and response[:MAX_MESSAGE_LEN] != shown:
+                shown = response[:MAX_MESSAGE_LEN]
+                await edit_message(sent, shown)
+                last_edit = loop.time()
+    except StreamInterruptedError:
+        response += INTERRUPTED_NOTE
+
+    if not response:
+        await message.answer("Error on API server side.")
+        return
+    parts = [response[i:i + MAX_MESSAGE_LEN] for i in range(0, len(response), MAX_MESSAGE_LEN)]
+    if parts[0] != shown:
+        await edit_message(sent, parts[0])
+    for part in parts[1:]:
+        await message.answer(part)
+
 
 async def main() -> None:
     """Запуск бота"""
-    await dp.start_polling(bot)
+    await start_http_client()
+    try:
+        if config["bot_mode"] == "webhook":
+            await run_webhook(bot, dp, config)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await close_http_client()
+        if response_cache is not None:
+            response_cache.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if config["bot_mode"] == "webhook" and config["webhook_workers"] > 1:
+        run_workers(__file__, config["webhook_workers"])
+    else:
+        asyncio.run(main())
@@ -3,6 +3,20 @@ import os
 
 load_dotenv()
 
+def _backend_limits(name: str) -> dict:
+    """
+    Лимиты одного бэкенда LLM: переменные {NAME}_CONCURRENCY, {NAME}_RATE, {NAME}_BURST
+    переопределяют общие LLM_CONCURRENCY, LLM_RATE, LLM_BURST.
+
+    :param name: Префикс переменных окружения бэкенда.
+    :return: Словарь с concurrency, rate и burst.
+    """
+    return {
+        "concurrency": int(os.getenv(f"{name}_CONCURRENCY", os.getenv("LLM_CONCURRENCY", "4"))),
+        "rate": float(os.getenv(f"{name}_RATE", os.getenv("LLM_RATE", "2"))),
+        "burst": int(os.getenv(f"{name}_BURST", os.getenv("LLM_BURST", "5")))
+    }
+
 def get_config() -> dict:
     """
     Возвращает конфигурациб тг-бота и RapidAPI
@@ -17,5 +31,44 @@ def get_config() -> dict:
         "gpt3_url": os.getenv("GPT3_URL"),
         "hf_token": os.getenv("HF_TOKEN"),
         "hf_host": os.getenv("HF_HOST"),
-        "hf_url": os.getenv("HF_URL")
+        "hf_url": os.getenv("HF_URL"),
+        "bot_mode": os.getenv("BOT_MODE", "polling"),
+        "webhook_url": os.getenv("WEBHOOK_URL", ""),
+        "webhook_path": os.getenv("WEBHOOK_PATH", "/telegram"),
+        "webhook_secret": os.getenv("WEBHOOK_SECRET", ""),
+        "webhook_host": os.getenv("WEBHOOK_HOST", "127.0.0.1"),
+        "webhook_port": int(os.getenv("WEBHOOK_PORT", "8091")),
+        "webhook_concurrency": int(os.getenv("WEBHOOK_CONCURRENCY", "8")),
+        "webhook_queue": int(os.getenv("WEBHOOK_QUEUE", "256")),
+        "webhook_workers": int(os.getenv("WEBHOOK_WORKERS", "1")),
+        "webhook_worker_index": int(os.getenv("WEBHOOK_WORKER_INDEX", "0")),
+        "webhook_shutdown_timeout": float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT", "30")),
+        "http_pool_limit": int(os.getenv("HTTP_POOL_LIMIT", "100")),
+        "http_limit_per_host": int(os.getenv("HTTP_LIMIT_PER_HOST", "20")),
+        "http_keepalive_timeout": float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30")),
+        "http_dns_cache_ttl": int(os.getenv("HTTP_DNS_CACHE_TTL", "300")),
+        "http_total_timeout": float(os.getenv("HTTP_TOTAL_TIMEOUT", "60")),
+        "http_connect_timeout": float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+        "http_read_timeout": float(os.getenv("HTTP_READ_TIMEOUT", "60")),
+        "llm_limits": {
+            "gpt4": _backend_limits("GPT4"),
+            "gpt3": _backend_limits("GPT3"),
+            "qwen": _backend_limits("QWEN")
+        },
+        "llm_queue_size": int(os.getenv("LLM_QUEUE_SIZE", "100")),
+        "llm_max_retries": int(os.getenv("LLM_MAX_RETRIES", "3")),
+        "llm_retry_base": float(os.getenv("LLM_RETRY_BASE", "0.5")),
+        "llm_retry_max": float(os.getenv("LLM_RETRY_MAX", "20")),
+        "llm_coalesce": os.getenv("LLM_COALESCE", "1") == "1",
+        "llm_hedge": os.getenv("LLM_HEDGE", "0") == "1",
+        "llm_hedge_delay": float(os.getenv("LLM_HEDGE_DELAY", "5")),
+        "llm_hedge_backends": os.getenv("LLM_HEDGE_BACKENDS", "gpt4,gpt3,qwen").split(","),
+        "llm_hedge_baseline": float(os.getenv("LLM_HEDGE_BASELINE", "0.05")),
+        "qwen_streaming": os.getenv("QWEN_STREAMING", "0") == "1",
+        "stream_edit_interval": float(os.getenv("STREAM_EDIT_INTERVAL", "1.5")),
+        "llm_cache": os.getenv("LLM_CACHE", "1") == "1",
+        "llm_cache_path": os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3"),
+        "llm_cache_memory_size": int(os.getenv("LLM_CACHE_MEMORY_SIZE", "1024")),
+        "llm_cache_max_entries": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000")),
+        "llm_cache_ttl": float(os.getenv("LLM_CACHE_TTL", "86400"))
     }
\ No newline at end of file
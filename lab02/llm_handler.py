@@ -1,19 +1,74 @@
 import aiohttp
+import asyncio
 import json
+import random
+import statistics
+from collections import deque
+from functools import partial
 from config import get_config
+from llm_scheduler import LLMScheduler, QueueFullError
+from response_cache import ResponseCache
 
 config = get_config()
 
-async def query_llm_api(url: str, host: str, payload: dict, api_type: str = "rapid", use_authorization: bool = False) -> dict:
+response_cache = ResponseCache(
+    config["llm_cache_path"],
+    config["llm_cache_memory_size"],
+    config["llm_cache_max_entries"],
+    config["llm_cache_ttl"]
+) if config["llm_cache"] else None
+
+scheduler = LLMScheduler(
+    config["llm_limits"],
+    config["llm_queue_size"],
+    config["llm_max_retries"],
+    config["llm_retry_base"],
+    config["llm_retry_max"]
+)
+
+_session: aiohttp.ClientSession = None
+
+async def start_http_client() -> aiohttp.ClientSession:
     """
-    Асинхронный POST-запрос к LLM API.
+    Создание общего HTTP-клиента с пулом keep-alive соединений.
+
+    Вызывается при запуске бота, чтобы TCP+TLS соединения с API переиспользовались
+    между сообщениями, а не открывались заново на каждый запрос.
+
+    :return: Сессия aiohttp.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=config["http_pool_limit"],
+            limit_per_host=config["http_limit_per_host"],
+            keepalive_timeout=config["http_keepalive_timeout"],
+            ttl_dns_cache=config["http_dns_cache_ttl"],
+            use_dns_cache=True
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=config["http_total_timeout"],
+            connect=config["http_connect_timeout"],
+            sock_read=config["http_read_timeout"]
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+async def close_http_client() -> None:
+    """Закрытие общего HTTP-клиента при остановке бота."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def _build_headers(host: str, api_type: str, use_authorization: bool = False) -> dict:
+    """
+    Заголовки запроса к LLM API.
 
-    :param url: URL на LLM.
     :param host: Хост для заголовка.
-    :param payload: Данные запроса.
     :param api_type: Тип API ("rapid" для RapidAPI, "hf" для Hugging Face).
     :param use_authorization: Флаг для добавления Authorization в RapidAPI.
-    :return: Словарь с ответом или None при ошибке.
+    :return: Словарь заголовков.
     """
     if api_type == "rapid":
         headers = {
@@ -30,13 +85,41 @@ async def query_llm_api(url: str, host: str, payload: dict, api_type: str = "rap
         }
     else:
         raise ValueError("Неверный api_type: rapid или hf")
+    return headers
+
+async def query_llm_api(url: str, host: str, payload: dict, api_type: str = "rapid", use_authorization: bool = False,
+                        backend: str = None) -> dict:
+    """
+    Асинхронный POST-запрос к LLM API.
+
+    Если указан бэкенд, запрос проходит через планировщик: ограничение параллельности
+    и частоты, очередь ожидания и повторы при 429 и 5xx.
+
+    :param url: URL на LLM.
+    :param host: Хост для заголовка.
+    :param payload: Данные запроса.
+    :param api_type: Тип API ("rapid" для RapidAPI, "hf" для Hugging Face).
+    :param use_authorization: Флаг для добавления Authorization в RapidAPI.
+    :param backend: Название бэкенда в планировщике: gpt4, gpt3 или qwen.
+    :return: Словарь с ответом или None при ошибке.
+    """
+    headers = _build_headers(host, api_type, use_authorization)
     
+    session = await start_http_client()
+
+    async def send() -> dict:
+        async with session.post(url, json=payload, headers=headers) as response:
+            response.raise_for_status()
+            return await response.json()
+
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=60)) as response:
-                response.raise_for_status()
-                return await response.json()
-    except aiohttp.ClientError as err:
+        if backend is None:
+            return await send()
+        return await scheduler.run(backend, send)
+    except QueueFullError as err:
+        print(f"Очередь запросов переполнена: {err}")
+        return None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
         print(f"Ошибка API: {err}")
         return None
 
@@ -44,6 +127,19 @@ async def get_qwen_response(user_query: str, context: str = "") -> str:
     """
     Запрос к Qwen3-8B через Hugging Face Router.
     """
+    payload = _qwen_payload(user_query, context)
+    response = await query_llm_api(config["hf_url"], config["hf_host"], payload, api_type="hf", backend="qwen")
+    return response["choices"][0]["message"]["content"] if response and "choices" in response else None
+
+def _qwen_payload(user_query: str, context: str = "", stream: bool = False) -> dict:
+    """
+    Тело запроса к Qwen3-8B.
+
+    :param user_query: Запрос пользователя.
+    :param context: Контекст системного промпта.
+    :param stream: Запросить ответ потоком SSE.
+    :return: Словарь запроса.
+    """
     payload = {
         "messages": [
             {"role": "system", "content": f"You are a movie advisor. {context}"},
@@ -60,15 +156,48 @@ async def get_qwen_response(user_query: str, context: str = "") -> str:
             "enable_thinking": True
         }
     }
-    response = await query_llm_api(config["hf_url"], config["hf_host"], payload, api_type="hf")
-    return response["choices"][0]["message"]["content"] if response and "choices" in response else None
+    if stream:
+        payload["stream"] = True
+    return payload
+
+async def stream_qwen_response(user_query: str, context: str = ""):
+    """
+    Потоковый запрос к Qwen3-8B: чтение SSE-ответа Hugging Face Router по мере генерации.
+
+    :param user_query: Запрос пользователя.
+    :param context: Контекст системного промпта.
+    :return: Асинхронный генератор фрагментов текста.
+    :raises aiohttp.ClientError: при ошибке соединения или HTTP-статусе ошибки.
+    :raises QueueFullError: если очередь планировщика переполнена.
+    """
+    session = await start_http_client()
+    headers = _build_headers(config["hf_host"], "hf")
+    async with scheduler.slot("qwen"), session.post(
+            config["hf_url"], json=_qwen_payload(user_query, context, stream=True), headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.content:
+            line = line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            choices = chunk.get("choices") or [{}]
+            text = (choices[0].get("delta") or {}).get("content")
+            if text:
+                yield text
 
 async def get_gpt4_response(user_query: str, context: str = "") -> str:
     payload = {
         "system_prompt": f"{context} You are movie advisor.",
         "user_prompt": user_query
     }
-    response = await query_llm_api(config["gpt4_url"], config["gpt4_host"], payload, api_type="rapid", use_authorization=True)
+    response = await query_llm_api(config["gpt4_url"], config["gpt4_host"], payload, api_type="rapid",
+                                 use_authorization=True, backend="gpt4")
     return response["response"] if response and "response" in response else None
 
 async def get_gpt3_response(user_query: str, context: str = "") -> str:
@@ -76,5 +205,204 @@ async def get_gpt3_response(user_query: str, context: str = "") -> str:
         {"role": "system", "content": f"{context} You are movie advisor."},
         {"role": "user", "content": user_query}
     ]
-    response = await query_llm_api(config["gpt3_url"], config["gpt3_host"], payload, api_type="rapid")
+    response = await query_llm_api(config["gpt3_url"], config["gpt3_host"], payload, api_type="rapid", backend="gpt3")
     return response["text"] if response and "text" in response else None
+
+
+MODEL_HANDLERS = {
+    "gpt4": get_gpt4_response,
+    "gpt3": get_gpt3_response,
+    "qwen": get_qwen_response
+}
+
+coalesce_stats = {"upstream": 0, "coalesced": 0}
+_in_flight = {}
+
+async def _single_flight(model: str, user_query: str, context: str = "") -> str:
+    """
+    Запрос к модели с объединением одинаковых одновременных запросов.
+
+    Пока запрос с той же моделью, нормализованным текстом и контекстом выполняется,
+    новые вызовы ждут его результат, а не отправляют свой. Отмена одного из ожидающих
+    не затрагивает остальных; когда отменён последний, отменяется и сам запрос,
+    освобождая слот планировщика (например, проигравший запрос при хеджировании).
+
+    :param model: Название модели.
+    :param user_query: Запрос пользователя.
+    :param context: Контекст системного промпта.
+    :return: Ответ модели или None при ошибке.
+    """
+    key = ResponseCache.make_key(model, user_query, context)
+    entry = _in_flight.get(key)
+    if entry is None or entry["abandoned"]:
+        entry = {"task": asyncio.ensure_future(MODEL_HANDLERS[model](user_query, context)), "waiters": 0,
+                 "abandoned": False}
+        _in_flight[key] = entry
+
+        def forget(_) -> None:
+            if _in_flight.get(key) is entry:
+                del _in_flight[key]
+
+        entry["task"].add_done_callback(forget)
+        coalesce_stats["upstream"] += 1
+    else:
+        coalesce_stats["coalesced"] += 1
+
+    entry["waiters"] += 1
+    try:
+        return await asyncio.shield(entry["task"])
+    finally:
+        entry["waiters"] -= 1
+        if not entry["waiters"] and not entry["task"].done():
+            entry["abandoned"] = True
+            entry["task"].cancel()
+
+async def get_response(model: str, user_query: str, context: str = "", use_cache: bool = True) -> str:
+    """
+    Ответ выбранной модели с использованием кэша ответов.
+
+    :param model: Название модели: gpt4, gpt3 или qwen.
+    :param user_query: Запрос пользователя.
+    :param context: Контекст системного промпта.
+    :param use_cache: False - не брать ответ из кэша, а запросить заново и обновить кэш.
+    :return: Ответ модели или None при ошибке.
+    """
+    handler = partial(_single_flight, model) if config["llm_coalesce"] else MODEL_HANDLERS[model]
+    if response_cache is None:
+        return await handler(user_query, context)
+
+    if use_cache:
+        cached = await response_cache.get(model, user_query, context)
+        if cached is not None:
+            return cached
+    else:
+        response_cache.bypassed += 1
+
+    response = await handler(user_query, context)
+    if response:
+        await response_cache.put(model, user_query, context, response)
+    return response
+
+hedge_stats = {"requests": 0, "hedged": 0, "failed": 0, "baseline": 0, "wins": {}, "saved_seconds": 0.0}
+_baseline_latencies = {model: deque(maxlen=200) for model in MODEL_HANDLERS}
+
+def _estimate_saved(model: str, elapsed: float) -> float:
+    """
+    Оценка времени, сэкономленного победой хеджа.
+
+    Отменённый запрос не доходит до конца, поэтому задержка основной модели берётся
+    из контрольных запросов без хеджирования. К моменту победы хеджа она уже работала
+    elapsed секунд, поэтому учитываются только контрольные задержки больше elapsed.
+
+    :param model: Модель, проигравшая гонку.
+    :param elapsed: Время до ответа победителя в секундах.
+    :return: Сэкономленное время в секундах.
+    """
+    slower = [latency for latency in _baseline_latencies[model] if latency > elapsed]
+    return statistics.median(slower) - elapsed if slower else 0.0
+
+async def get_hedged_response(model: str, user_query: str, context: str = "", use_cache: bool = True) -> str:
+    """
+    Ответ с хеджированием: если выбранная модель не ответила за llm_hedge_delay секунд
+    или вернула ошибку, тот же запрос отправляется следующей модели из llm_hedge_backends.
+
+    Используется первый успешный ответ, остальные запросы отменяются. Доля llm_hedge_baseline
+    запросов идёт без хеджа по задержке (только с запасной моделью при ошибке): их задержки
+    служат базой для оценки сэкономленного времени.
+
+    :param model: Выбранная модель.
+    :param user_query: Запрос пользователя.
+    :param context: Контекст системного промпта.
+    :param use_cache: Использовать ли кэш ответов.
+    :return: Ответ модели или None, если ни одна модель не ответила.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    backends = [model] + [backend for backend in config["llm_hedge_backends"]
+                          if backend != model and backend in MODEL_HANDLERS][:1]
+    hedge_stats["requests"] += 1
+    baseline = len(backends) > 1 and random.random() < config["llm_hedge_baseline"]
+    if baseline:
+        hedge_stats["baseline"] += 1
+
+    async def timed(backend: str) -> str:
+        sent_at = loop.time()
+        response = await get_response(backend, user_query, context, use_cache)
+        if response and baseline and backend == model:
+            _baseline_latencies[backend].append(loop.time() - sent_at)
+        return response
+
+    tasks = {asyncio.create_task(timed(model)): model}
+    pending = set(tasks)
+    try:
+        while pending or len(tasks) < len(backends):
+            timeout = config["llm_hedge_delay"] if len(tasks) < len(backends) and not baseline else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                response = task.result()
+                if response:
+                    winner = tasks[task]
+                    hedge_stats["wins"][winner] = hedge_stats["wins"].get(winner, 0) + 1
+                    if winner != model:
+                        hedge_stats["saved_seconds"] += _estimate_saved(model, loop.time() - started)
+                    return response
+            if len(tasks) < len(backends):
+                backend = backends[len(tasks)]
+                hedge_stats["hedged"] += 1
+                task = asyncio.create_task(timed(backend))
+                tasks[task] = backend
+                pending.add(task)
+        hedge_stats["failed"] += 1
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+class StreamInterruptedError(Exception):
+    """Поток ответа оборвался после того, как часть текста уже была отдана."""
+
+async def stream_response(model: str, user_query: str, context: str = "", use_cache: bool = True):
+    """
+    Ответ модели потоком фрагментов; для моделей без потоковой выдачи - одним фрагментом.
+
+    Ответ из кэша отдаётся сразу целиком. В кэш сохраняется только поток,
+    дошедший до конца без ошибок. Ошибка до первого фрагмента завершает генератор
+    без фрагментов, ошибка после него поднимает StreamInterruptedError.
+
+    :param model: Название модели: gpt4, gpt3 или qwen.
+    :param user_query: Запрос пользователя.
+    :param context: Контекст системного промпта.
+    :param use_cache: False - не брать ответ из кэша.
+    :return: Асинхронный генератор фрагментов текста.
+    :raises StreamInterruptedError: если поток оборвался на середине ответа.
+    """
+    if model != "qwen":
+        response = await get_response(model, user_query, context, use_cache)
+        if response:
+            yield response
+        return
+
+    if response_cache is not None:
+        if use_cache:
+            cached = await response_cache.get(model, user_query, context)
+            if cached is not None:
+                yield cached
+                return
+        else:
+            response_cache.bypassed += 1
+
+    parts = []
+    try:
+        async for text in stream_qwen_response(user_query, context):
+            parts.append(text)
+            yield text
+    except QueueFullError as err:
+        print(f"Очередь запросов переполнена: {err}")
+        return
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+        print(f"Ошибка API: {err}")
+        if parts:
+            raise StreamInterruptedError(str(err)) from err
+        return
+    if parts and response_cache is not None:
+        await response_cache.put(model, user_query, context, "".join(parts))
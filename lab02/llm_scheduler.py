@@ -0,0 +1,235 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+import aiohttp
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class QueueFullError(RuntimeError):
+    """Очередь ожидания бэкенда переполнена."""
+
+def parse_retry_after(value: str) -> float:
+    """
+    Разбор заголовка Retry-After.
+
+    :param value: Число секунд или HTTP-дата.
+    :return: Задержка в секундах или None, если заголовок не разобран.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        """
+        Ограничение частоты запросов алгоритмом token bucket.
+
+        :param rate: Количество запросов в секунду.
+        :param burst: Максимальный размер пачки запросов.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, delay: float) -> None:
+        """
+        Приостановить выдачу токенов, например по Retry-After.
+
+        :param delay: Пауза в секундах.
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    async def acquire(self) -> None:
+        """Дождаться свободного токена."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class BackendScheduler:
+    def __init__(self, name: str, concurrency: int = 4, rate: float = 2.0, burst: int = 5, max_queue: int = 100,
+                 max_retries: int = 3, retry_base: float = 0.5, retry_max: float = 20.0) -> None:
+        """
+        Планировщик запросов к одному бэкенду LLM.
+
+        :param name: Название бэкенда.
+        :param concurrency: Максимум одновременных запросов.
+        :param rate: Максимум запросов в секунду.
+        :param burst: Размер пачки token bucket.
+        :param max_queue: Максимум запросов, ожидающих свободного слота.
+        :param max_retries: Количество повторов при 429, 5xx и сетевых ошибках.
+        :param retry_base: Базовая задержка экспоненциального отката в секундах.
+        :param retry_max: Максимальная задержка отката в секундах.
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.bucket = TokenBucket(rate, burst)
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.retries = 0
+        self.failed = 0
+        self.queue_times = deque(maxlen=1000)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Занять слот бэкенда: место в очереди, семафор и токен частоты.
+
+        :raises QueueFullError: Если очередь ожидания заполнена.
+        """
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name}: в очереди уже {self.waiting} запросов")
+        self.waiting += 1
+        enqueued = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            await self.bucket.acquire()
+            self.queue_times.append(time.monotonic() - enqueued)
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+        finally:
+            self._semaphore.release()
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Задержка перед повтором с полным случайным разбросом.
+
+        :param attempt: Номер неудачной попытки, начиная с 0.
+        :return: Задержка в секундах.
+        """
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+
+    async def run(self, request_factory):
+        """
+        Выполнить запрос в слоте бэкенда с повторами.
+
+        При 429 и 503 с заголовком Retry-After пауза применяется ко всему бэкенду,
+        чтобы остальные запросы тоже не упирались в лимит провайдера.
+
+        :param request_factory: Функция без аргументов, возвращающая корутину запроса.
+        :return: Результат запроса.
+        :raises QueueFullError: Если очередь ожидания заполнена.
+        """
+        async with self.slot():
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await request_factory()
+                    self.completed += 1
+                    return result
+                except aiohttp.ClientResponseError as err:
+                    if err.status not in RETRY_STATUSES or attempt == self.max_retries:
+                        self.failed += 1
+                        raise
+                    retry_after = parse_retry_after((err.headers or {}).get("Retry-After"))
+                    if retry_after is not None:
+                        self.bucket.pause(min(retry_after, self.retry_max))
+                        delay = 0.0
+                    else:
+                        delay = self._backoff(attempt)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == self.max_retries:
+                        self.failed += 1
+                        raise
+                    delay = self._backoff(attempt)
+                self.retries += 1
+                await asyncio.sleep(delay)
+                await self.bucket.acquire()
+
+    def stats(self) -> dict:
+        """
+        Статистика бэкенда.
+
+        :return: Словарь со счётчиками и временем ожидания в очереди.
+        """
+        queue_times = sorted(self.queue_times)
+        return {
+            "waiting": self.waiting,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "queue_p50": queue_times[len(queue_times) // 2] if queue_times else 0.0,
+            "queue_p95": queue_times[int(len(queue_times) * 0.95)] if queue_times else 0.0,
+            "queue_max": queue_times[-1] if queue_times else 0.0
+        }
+
+class LLMScheduler:
+    def __init__(self, limits: dict, max_queue: int = 100, max_retries: int = 3,
+                 retry_base: float = 0.5, retry_max: float = 20.0) -> None:
+        """
+        Набор планировщиков по бэкендам.
+
+        :param limits: Словарь {бэкенд: {"concurrency", "rate", "burst"}}.
+        :param max_queue: Максимум ожидающих запросов на бэкенд.
+        :param max_retries: Количество повторов.
+        :param retry_base: Базовая задержка отката в секундах.
+        :param retry_max: Максимальная задержка отката в секундах.
+        """
+        self.backends = {
+            name: BackendScheduler(name, backend_limits["concurrency"], backend_limits["rate"],
+                                   backend_limits["burst"], max_queue, max_retries, retry_base, retry_max)
+            for name, backend_limits in limits.items()
+        }
+
+    async def run(self, backend: str, request_factory):
+        """
+        Выполнить запрос через планировщик бэкенда.
+
+        :param backend: Название бэкенда.
+        :param request_factory: Функция без аргументов, возвращающая корутину запроса.
+        :return: Результат запроса.
+        """
+        return await self.backends[backend].run(request_factory)
+
+    def slot(self, backend: str):
+        """
+        Слот бэкенда без повторов, для потоковых ответов.
+
+        :param backend: Название бэкенда.
+        :return: Асинхронный контекстный менеджер.
+        """
+        return self.backends[backend].slot()
+
+    def stats(self) -> dict:
+        """
+        Статистика по всем бэкендам.
+
+        :return: Словарь {бэкенд: статистика}.
+        """
+        return {name: backend.stats() for name, backend in self.backends.items()}
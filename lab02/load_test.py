@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import importlib
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+from mock_llm_server import mock_env, run_server
+
+QUERIES = ["Interstellar", "Seven", "Arrival", "The Matrix", "Amelie", "Heat", "Alien", "Up", "Drive", "Her"]
+ERROR_REPLY = "Error on API server side."
+
+class FakeMessage:
+    def __init__(self, text: str, user_id: int = 0) -> None:
+        """
+        Имитация сообщения Telegram: хранит ответы бота вместо отправки.
+
+        :param text: Текст сообщения.
+        :param user_id: ID пользователя.
+        """
+        self.text = text
+        self.user_id = user_id
+        self.replies = []
+        self.first_reply_at = None
+
+    async def answer(self, text: str) -> "FakeMessage":
+        if self.first_reply_at is None:
+            self.first_reply_at = time.monotonic()
+        self.replies.append(text)
+        return FakeMessage(text, self.user_id)
+
+    async def edit_text(self, text: str) -> None:
+        self.text = text
+
+def open_sockets() -> int:
+    """
+    Количество открытых сокетов процесса (только Linux).
+
+    :return: Число сокетов или None, если /proc недоступен.
+    """
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            count += os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+        except OSError:
+            pass
+    return count
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Перцентиль по отсортированному списку.
+
+    :param values: Отсортированные значения.
+    :param fraction: Доля от 0 до 1.
+    :return: Значение перцентиля или 0.0 для пустого списка.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def drive(bot_module, rate: float, duration: float, distinct: int) -> dict:
+    """
+    Отправка сообщений в handle_query с пуассоновским потоком заданной интенсивности.
+
+    :param bot_module: Импортированный модуль bot.
+    :param rate: Сообщений в секунду.
+    :param duration: Длительность подачи нагрузки в секундах.
+    :param distinct: Количество различных запросов.
+    :return: Словарь с результатами.
+    """
+    results, tasks = [], []
+    sockets = {"peak": 0}
+
+    async def one(message: FakeMessage) -> None:
+        started = time.monotonic()
+        try:
+            await bot_module.handle_query(message)
+            failed = not message.replies or message.replies[0] == ERROR_REPLY
+        except Exception as err:
+            print(f"Ошибка обработки: {err!r}")
+            failed = True
+        finished = time.monotonic()
+        results.append((finished - started, (message.first_reply_at or finished) - started, failed))
+
+    async def sample_sockets() -> None:
+        while True:
+            sockets["peak"] = max(sockets["peak"], open_sockets() or 0)
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_sockets())
+    started = time.monotonic()
+    sent = 0
+    while time.monotonic() - started < duration:
+        query = f"Recommend a movie like {QUERIES[sent % len(QUERIES)]} #{sent % distinct}"
+        tasks.append(asyncio.create_task(one(FakeMessage(query, sent))))
+        sent += 1
+        await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    sampler.cancel()
+
+    latencies = sorted(latency for latency, _, _ in results)
+    first_replies = sorted(first for _, first, _ in results)
+    errors = sum(failed for _, _, failed in results)
+    return {
+        "sent": sent,
+        "elapsed": elapsed,
+        "throughput": (sent - errors) / elapsed,
+        "error_rate": errors / sent if sent else 0.0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "first_reply_p50": percentile(first_replies, 0.5),
+        "first_reply_p95": percentile(first_replies, 0.95),
+        "sockets_peak": sockets["peak"]
+    }
+
+async def run(args) -> dict:
+    """
+    Нагрузочный прогон бота против mock-сервера.
+
+    :param args: Аргументы командной строки.
+    :return: Словарь с результатами.
+    """
+    bot_module = importlib.import_module("bot")
+    llm_handler = importlib.import_module("llm_handler")
+    bot_module.current_model = args.model
+    await llm_handler.start_http_client()
+    try:
+        report = await drive(bot_module, args.rate, args.duration, args.distinct)
+    finally:
+        await llm_handler.close_http_client()
+        if llm_handler.response_cache is not None:
+            llm_handler.response_cache.close()
+    await asyncio.sleep(0.25)
+    report["sockets_after"] = open_sockets()
+    report["model"] = args.model
+    report["rate"] = args.rate
+    report["scheduler"] = llm_handler.scheduler.stats()[args.model]
+    report["coalesce"] = dict(llm_handler.coalesce_stats)
+    if bot_module.config["llm_hedge"]:
+        report["hedge"] = dict(llm_handler.hedge_stats)
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест lab02: handle_query против mock LLM API")
+    parser.add_argument("--model", choices=["gpt4", "gpt3", "qwen"], default="gpt4")
+    parser.add_argument("--rate", type=float, default=20.0, help="сообщений в секунду")
+    parser.add_argument("--duration", type=float, default=30.0, help="секунд подачи нагрузки")
+    parser.add_argument("--distinct", type=int, default=1000, help="различных запросов")
+    parser.add_argument("--mock-url", default="", help="адрес уже запущенного mock_llm_server.py")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", default="lognormal:0.8:0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="не отключать кэш ответов")
+    parser.add_argument("--output", default="", help="файл для JSON-отчёта")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.mock_url.rstrip("/")
+    if not base_url:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = mp.Process(target=run_server, kwargs={
+            "port": args.port, "latency": args.latency,
+            "error_rate": args.error_rate, "rate_limit_rate": args.rate_limit_rate
+        }, daemon=True)
+        server.start()
+        time.sleep(1.0)
+
+    # config читается при импорте llm_handler, поэтому окружение задаётся до импорта bot
+    os.environ.update(mock_env(base_url))
+    os.environ.setdefault("TELEGRAM_TOKEN", "123456:mock-token")
+    if not args.cache:
+        os.environ["LLM_CACHE"] = "0"
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    print(f"{report['model']}: {report['sent']} сообщений за {report['elapsed']:.1f} с, "
+          f"{report['throughput']:.1f} успешных/с, ошибок {report['error_rate']:.1%}")
+    print(f"Задержка p50/p95/p99/max: {report['latency_p50']:.2f}/{report['latency_p95']:.2f}/"
+          f"{report['latency_p99']:.2f}/{report['latency_max']:.2f} с, "
+          f"первый ответ p50/p95: {report['first_reply_p50']:.2f}/{report['first_reply_p95']:.2f} с")
+    print(f"Сокеты: пик {report['sockets_peak']}, после закрытия {report['sockets_after']}")
+    print(f"Планировщик: {report['scheduler']}")
+    print(f"Объединение запросов: {report['coalesce']}")
+    if "hedge" in report:
+        print(f"Хеджирование: {report['hedge']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import random
+from aiohttp import web
+
+ANSWER = ("Try Arrival (2016): a linguist decodes an alien language while the story bends time. "
+          "If you liked the scale of Interstellar, Contact (1997) and Sunshine (2007) are also worth a look.")
+
+def parse_latency(spec: str):
+    """
+    Разбор распределения задержки.
+
+    :param spec: "fixed:0.5", "uniform:0.2:1.5" или "lognormal:0.8:0.6" (медиана и sigma).
+    :return: Функция без аргументов, возвращающая задержку в секундах.
+    """
+    kind, *params = spec.split(":")
+    values = [float(value) for value in params]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(0, sigma) * median
+    raise ValueError(f"Неизвестное распределение задержки: {spec}")
+
+class MockLLMServer:
+    def __init__(self, latency: str = "lognormal:0.8:0.6", error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: float = 1.0, chunk_delay: float = 0.05) -> None:
+        """
+        Локальная замена RapidAPI GPT-4, GPT-3 и Hugging Face Router для нагрузочных тестов.
+
+        :param latency: Распределение задержки ответа, см. parse_latency.
+        :param error_rate: Доля ответов 500/503.
+        :param rate_limit_rate: Доля ответов 429 с заголовком Retry-After.
+        :param retry_after: Значение Retry-After в секундах.
+        :param chunk_delay: Пауза между фрагментами потокового ответа.
+        """
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.chunk_delay = chunk_delay
+        self.stats = {"requests": 0, "active": 0, "peak_active": 0, "errors": 0, "rate_limited": 0}
+
+    def _failure(self) -> web.Response:
+        """
+        Случайная ошибка с заданными вероятностями.
+
+        :return: Ответ с ошибкой или None.
+        """
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return web.json_response({"message": "Too many requests"}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"message": "Upstream error"}, status=random.choice([500, 503]))
+        return None
+
+    async def _handle(self, request: web.Request, build) -> web.StreamResponse:
+        """
+        Общая обработка: счётчики, ошибки и задержка.
+
+        :param request: Запрос.
+        :param build: Корутина, формирующая успешный ответ по телу запроса.
+        :return: Ответ.
+        """
+        self.stats["requests"] += 1
+        self.stats["active"] += 1
+        self.stats["peak_active"] = max(self.stats["peak_active"], self.stats["active"])
+        try:
+            payload = await request.json()
+            failure = self._failure()
+            if failure is not None:
+                await asyncio.sleep(self.latency() / 10)
+                return failure
+            return await build(request, payload)
+        finally:
+            self.stats["active"] -= 1
+
+    async def _gpt4(self, request: web.Request, payload: dict) -> web.Response:
+        await asyncio.sleep(self.latency())
+        return web.json_response({"response": ANSWER})
+
+    async def _gpt3(self, request: web.Request, payload: list) -> web.Response:
+        await asyncio.sleep(self.latency())
+        return web.json_response({"text": ANSWER})
+
+    async def _chat(self, request: web.Request, payload: dict) -> web.StreamResponse:
+        if not payload.get("stream"):
+            await asyncio.sleep(self.latency())
+            return web.json_response({"choices": [{"message": {"role": "assistant", "content": ANSWER}}]})
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(self.latency() / 2)
+        for word in ANSWER.split(" "):
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self.chunk_delay)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    def create_app(self) -> web.Application:
+        """
+        Приложение aiohttp с маршрутами /gpt4, /gpt3, /v1/chat/completions и /stats.
+
+        :return: Приложение.
+        """
+        app = web.Application()
+        app.router.add_post("/gpt4", lambda request: self._handle(request, self._gpt4))
+        app.router.add_post("/gpt3", lambda request: self._handle(request, self._gpt3))
+        app.router.add_post("/v1/chat/completions", lambda request: self._handle(request, self._chat))
+        app.router.add_get("/stats", self._stats)
+        return app
+
+def mock_env(base_url: str) -> dict:
+    """
+    Переменные окружения, направляющие llm_handler на mock-сервер.
+
+    :param base_url: Адрес сервера, например http://127.0.0.1:8080.
+    :return: Словарь переменных окружения.
+    """
+    host = base_url.split("://", 1)[-1]
+    return {
+        "GPT4_URL": f"{base_url}/gpt4",
+        "GPT4_HOST": host,
+        "GPT3_URL": f"{base_url}/gpt3",
+        "GPT3_HOST": host,
+        "HF_URL": f"{base_url}/v1/chat/completions",
+        "HF_HOST": host,
+        "RAPIDAPI_KEY": "mock",
+        "HF_TOKEN": "mock"
+    }
+
+def run_server(host: str = "127.0.0.1", port: int = 8080, **options) -> None:
+    """
+    Запуск mock-сервера до остановки процесса.
+
+    :param host: Адрес.
+    :param port: Порт.
+    :param options: Параметры MockLLMServer.
+    """
+    web.run_app(MockLLMServer(**options).create_app(), host=host, port=port, print=None)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock LLM API для нагрузочных тестов lab02")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", default="lognormal:0.8:0.6",
+                        help="fixed:S, uniform:MIN:MAX или lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"Mock LLM API на http://{args.host}:{args.port}")
+    for name, value in mock_env(f"http://{args.host}:{args.port}").items():
+        print(f"{name}={value}")
+    run_server(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+               rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, chunk_delay=args.chunk_delay)
+
+if __name__ == "__main__":
+    main()
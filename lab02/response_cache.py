@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_text(text: str) -> str:
+    """
+    Нормализация текста запроса для ключа кэша.
+
+    :param text: Исходный текст.
+    :return: Текст в нижнем регистре, без лишних пробелов и завершающей пунктуации.
+    """
+    return " ".join(text.casefold().split()).rstrip(" .!?")
+
+class ResponseCache:
+    def __init__(self, db_path: str = "", memory_size: int = 1024, max_entries: int = 100000,
+                 ttl: float = 86400.0) -> None:
+        """
+        Двухуровневый кэш ответов LLM: LRU в памяти перед SQLite на диске.
+
+        :param db_path: Путь к файлу SQLite, пустая строка - только память.
+        :param memory_size: Количество ответов в памяти.
+        :param max_entries: Количество ответов на диске; лимит проверяется раз в trim_interval записей,
+            поэтому между проверками он может быть превышен не больше чем на trim_interval.
+        :param ttl: Время жизни ответа в секундах.
+        """
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.trim_interval = max(1, min(1000, max_entries // 100))
+        self._puts_since_trim = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._connection = None
+        if db_path:
+            self._connection = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    @staticmethod
+    def make_key(model: str, user_query: str, context: str = "") -> str:
+        """
+        Ключ кэша по модели, нормализованному запросу и контексту.
+
+        :param model: Название модели.
+        :param user_query: Запрос пользователя.
+        :param context: Контекст системного промпта.
+        :return: SHA-256 ключа.
+        """
+        raw = json.dumps([model, normalize_text(user_query), normalize_text(context)], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        """
+        Положить ответ в память с вытеснением самого старого, вызывается под _lock.
+
+        :param key: Ключ кэша.
+        :param response: Ответ модели.
+        :param expires_at: Время истечения.
+        """
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _get_memory(self, key: str, now: float) -> str:
+        """
+        Поиск ответа в памяти без обращения к диску.
+
+        _lock защищает только память и счётчики и не удерживается на время запросов
+        к SQLite, поэтому поиск можно выполнять в цикле событий. Время попадания
+        запоминается в _touched и переносится в last_used на диске пакетом
+        в _flush_touched, чтобы горячие ответы не вытеснялись с диска первыми.
+
+        :param key: Ключ кэша.
+        :param now: Текущее время.
+        :return: Ответ или None.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            if self._connection is not None:
+                self._touched[key] = now
+            return entry[0]
+
+    def _get_disk(self, key: str, now: float) -> str:
+        """
+        Синхронный поиск ответа на диске после промаха в памяти.
+
+        :param key: Ключ кэша.
+        :param now: Текущее время.
+        :return: Ответ или None.
+        """
+        with self._db_lock:
+            if len(self._touched) >= self.memory_size:
+                self._flush_touched()
+            row = self._connection.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            elif row is not None:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+        with self._lock:
+            if row is not None and row[1] > now:
+                self._touched.pop(key, None)
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def _flush_touched(self) -> None:
+        """Перенос времени попаданий в память в last_used на диске, вызывается под _db_lock."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            self._connection.executemany(
+                "UPDATE responses SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, key) for key, used in touched.items()]
+            )
+
+    def _put(self, key: str, response: str) -> None:
+        """
+        Синхронное сохранение ответа в память и на диск.
+
+        :param key: Ключ кэша.
+        :param response: Ответ модели.
+        """
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, response, expires_at)
+            self._touched.pop(key, None)
+        if self._connection is None:
+            return
+        with self._db_lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, expires_at, now)
+            )
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= self.trim_interval:
+                self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        """
+        Удаление истёкших ответов и самых давно использованных сверх max_entries.
+
+        Вызывается под _db_lock раз в trim_interval записей: подсчёт и удаление
+        просроченных требуют прохода по таблице, а лишние строки удаляются
+        с начала индекса по last_used после переноса попаданий в память.
+
+        :param now: Текущее время.
+        """
+        self._puts_since_trim = 0
+        self._flush_touched()
+        self._connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        excess = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            evicted = self._connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            ).rowcount
+            with self._lock:
+                self.evictions += evicted
+
+    async def get(self, model: str, user_query: str, context: str = "") -> str:
+        """
+        Найти сохранённый ответ.
+
+        :param model: Название модели.
+        :param user_query: Запрос пользователя.
+        :param context: Контекст системного промпта.
+        :return: Ответ или None при промахе.
+        """
+        key = self.make_key(model, user_query, context)
+        now = time.time()
+        response = self._get_memory(key, now)
+        if response is not None:
+            return response
+        if self._connection is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return await asyncio.to_thread(self._get_disk, key, now)
+
+    async def put(self, model: str, user_query: str, context: str, response: str) -> None:
+        """
+        Сохранить ответ.
+
+        :param model: Название модели.
+        :param user_query: Запрос пользователя.
+        :param context: Контекст системного промпта.
+        :param response: Ответ модели.
+        """
+        key = self.make_key(model, user_query, context)
+        if self._connection is None:
+            self._put(key, response)
+        else:
+            await asyncio.to_thread(self._put, key, response)
+
+    def _stats(self) -> dict:
+        """
+        Синхронный сбор статистики, размер на диске считается запросом COUNT(*).
+
+        :return: Словарь со статистикой.
+        """
+        disk_size = 0
+        if self._connection is not None:
+            with self._db_lock:
+                disk_size = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_size": len(self._memory),
+                "disk_size": disk_size
+            }
+
+    async def stats(self) -> dict:
+        """
+        Статистика кэша.
+
+        :return: Словарь с попаданиями по уровням, промахами и долей попаданий.
+        """
+        if self._connection is None:
+            return self._stats()
+        return await asyncio.to_thread(self._stats)
+
+    def close(self) -> None:
+        """Закрытие базы."""
+        with self._db_lock:
+            if self._connection is not None:
+                self._flush_touched()
+                self._connection.close()
+                self._connection = None
@@ -1,9 +1,10 @@
 import asyncio
-from llm_handler import get_qwen_response
+from llm_handler import get_qwen_response, close_http_client
 
 async def test():
     gpt_resp = await get_qwen_response("Recommend a movie like Seven.")
     print("ans:", gpt_resp)
+    await close_http_client()
 
 if __name__ == "__main__":
     asyncio.run(test())
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class UpdateWorkers:
+    def __init__(self, bot: Bot, dp: Dispatcher, concurrency: int = 8, queue_size: int = 256) -> None:
+        """
+        Пул обработчиков обновлений вебхука с ограниченной параллельностью.
+
+        Каждый обработчик читает свою очередь, обновления одного чата всегда попадают
+        в одну очередь, поэтому шаги диалога пользователя выполняются по порядку.
+
+        :param bot: Бот aiogram.
+        :param dp: Диспетчер.
+        :param concurrency: Количество одновременно обрабатываемых обновлений.
+        :param queue_size: Размер очереди каждого обработчика.
+        """
+        self.bot = bot
+        self.dp = dp
+        self.queues = [asyncio.Queue(queue_size) for _ in range(concurrency)]
+        self.tasks = []
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Запустить обработчики."""
+        self.tasks = [asyncio.create_task(self._work(queue)) for queue in self.queues]
+
+    @staticmethod
+    def _chat_key(update: Update) -> int:
+        """
+        Ключ распределения обновления: чат, иначе отправитель, иначе номер обновления.
+
+        :param update: Обновление Telegram.
+        :return: Целочисленный ключ.
+        """
+        event = update.event
+        chat = getattr(event, "chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(event, "from_user", None)
+        return user.id if user is not None else update.update_id
+
+    def submit(self, update: Update) -> bool:
+        """
+        Поставить обновление в очередь своего обработчика.
+
+        :param update: Обновление Telegram.
+        :return: False, если очередь заполнена.
+        """
+        queue = self.queues[self._chat_key(update) % len(self.queues)]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    def pending(self) -> int:
+        """
+        Количество обновлений в очередях.
+
+        :return: Суммарная длина очередей.
+        """
+        return sum(queue.qsize() for queue in self.queues)
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        """
+        Цикл обработчика: передача обновлений в диспетчер.
+
+        :param queue: Очередь обработчика.
+        """
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as err:
+                print(f"Ошибка обработки обновления {update.update_id}: {err!r}")
+            finally:
+                queue.task_done()
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Дождаться обработки принятых обновлений и остановить обработчики.
+
+        :param timeout: Максимальное время ожидания в секундах.
+        """
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            print(f"Не обработано {self.pending()} обновлений к остановке")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+def create_webhook_app(bot: Bot, workers: UpdateWorkers, path: str, secret: str = "") -> web.Application:
+    """
+    Приложение aiohttp с маршрутом вебхука и проверкой состояния /healthz.
+
+    Обновление подтверждается сразу после постановки в очередь. При заполненной очереди
+    возвращается 503, и Telegram повторит доставку позже.
+
+    :param bot: Бот aiogram.
+    :param workers: Пул обработчиков.
+    :param path: Путь вебхука.
+    :param secret: Секрет из заголовка X-Telegram-Bot-Api-Secret-Token, пустая строка - без проверки.
+    :return: Приложение.
+    """
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        update = Update.model_validate(await request.json(), context={"bot": bot})
+        if not workers.submit(update):
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"pending": workers.pending(), "rejected": workers.rejected})
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get("/healthz", health)
+    return app
+
+async def run_webhook(bot: Bot, dp: Dispatcher, config: dict) -> None:
+    """
+    Приём обновлений через вебхук до SIGINT/SIGTERM с плавной остановкой.
+
+    При остановке сервер перестаёт принимать запросы, затем обработчики дорабатывают
+    очередь не дольше webhook_shutdown_timeout секунд. Вебхук в Telegram регистрирует
+    только процесс с индексом 0, и при остановке он не удаляется, чтобы остальные
+    процессы за прокси продолжали получать обновления.
+
+    :param bot: Бот aiogram.
+    :param dp: Диспетчер.
+    :param config: Конфигурация бота.
+    """
+    index = config["webhook_worker_index"]
+    port = config["webhook_port"] + index
+    workers = UpdateWorkers(bot, dp, config["webhook_concurrency"], config["webhook_queue"])
+    runner = web.AppRunner(create_webhook_app(bot, workers, config["webhook_path"], config["webhook_secret"]))
+    await runner.setup()
+    site = web.TCPSite(runner, config["webhook_host"], port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await dp.emit_startup(bot=bot)
+    workers.start()
+    await site.start()
+    if index == 0 and config["webhook_url"]:
+        await bot.set_webhook(config["webhook_url"], secret_token=config["webhook_secret"] or None)
+    print(f"Вебхук слушает http://{config['webhook_host']}:{port}{config['webhook_path']}")
+    try:
+        await stop.wait()
+    finally:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signum)
+        await site.stop()
+        await workers.drain(config["webhook_shutdown_timeout"])
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+def run_workers(script: str, workers: int) -> None:
+    """
+    Запуск нескольких процессов бота в режиме вебхука на портах webhook_port + индекс.
+
+    Порты процессов указываются в upstream обратного прокси. Сигналы остановки
+    пересылаются процессам, родитель ждёт их завершения.
+
+    :param script: Путь к скрипту бота.
+    :param workers: Количество процессов.
+    """
+    processes = [
+        subprocess.Popen([sys.executable, script],
+                         env=dict(os.environ, WEBHOOK_WORKERS="1", WEBHOOK_WORKER_INDEX=str(index)))
+        for index in range(workers)
+    ]
+
+    def forward(signum, frame) -> None:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for process in processes:
+        process.wait()
@@ -0,0 +1,262 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from data_handler import DataProcessor
+from metrics import metrics
+from rating_store import segment_positions
+
+class ALSRecommender:
+    def __init__(self, data_processor: DataProcessor, num_factors: int = 32, regularization: float = 0.1,
+                 iterations: int = 10, num_threads: int = 4, seed: int = 0) -> None:
+        """
+        Инициализация движка матричной факторизации (explicit ALS с bias фильмов)
+
+        :param data_processor: обработчик данных для работы с оценками пользователей
+        :param num_factors: размерность скрытых факторов
+        :param regularization: коэффициент регуляризации (умножается на число оценок)
+        :param iterations: количество итераций ALS
+        :param num_threads: количество потоков при обучении
+        :param seed: зерно начальной инициализации факторов
+        """
+        self.dp = data_processor
+        self.num_factors = num_factors
+        self.regularization = regularization
+        self.iterations = iterations
+        self.num_threads = num_threads
+        self.seed = seed
+        self.global_mean = 0.0
+        self.item_bias = None
+        self.user_factors = None
+        self.item_factors = None
+        self.movie_ids = None
+        self.fingerprint = ""
+
+    def train(self) -> None:
+        """Обучение факторов на всех оценках хранилища"""
+        store = self.dp.rating_store
+        rows, cols, ratings = store.gather_rows(np.arange(store.n_users))
+        self.fingerprint = self._fingerprint(rows, cols, ratings)
+        ratings = ratings.astype(np.float64)
+        n_users, n_movies = store.n_users, store.n_movies
+
+        self.global_mean = float(ratings.mean()) if len(ratings) else 0.0
+        centered = ratings - self.global_mean
+        movie_counts = np.bincount(cols, minlength=n_movies)
+        self.item_bias = np.bincount(cols, weights=centered, minlength=n_movies) / (movie_counts + 10.0)
+        residuals = centered - self.item_bias[cols]
+
+        rng = np.random.default_rng(self.seed)
+        self.item_factors = rng.normal(0, 0.1, (n_movies, self.num_factors))
+        self.user_factors = np.zeros((n_users, self.num_factors))
+
+        by_user = np.argsort(rows, kind='stable')
+        by_movie = np.argsort(cols, kind='stable')
+        with ThreadPoolExecutor(self.num_threads) as pool, metrics.span("als_train"):
+            for iteration in range(self.iterations):
+                self.user_factors = self._solve(pool, rows[by_user], cols[by_user], residuals[by_user],
+                                                self.item_factors, n_users)
+                self.item_factors = self._solve(pool, cols[by_movie], rows[by_movie], residuals[by_movie],
+                                                self.user_factors, n_movies)
+                predictions = np.einsum('ij,ij->i', self.user_factors[rows], self.item_factors[cols])
+                rmse = np.sqrt(np.mean((residuals - predictions) ** 2))
+                print(f"ALS итерация {iteration + 1}/{self.iterations}: RMSE на обучении {rmse:.4f}")
+
+        self.movie_ids = store.movie_ids[:n_movies].copy()
+
+    def _fingerprint(self, rows: np.ndarray, cols: np.ndarray, ratings: np.ndarray) -> str:
+        """
+        SHA-256 обучающих троек (user_id, movie_id, оценка)
+
+        Без буфера изменений gather_rows отдаёт оценки в порядке CSR, с буфером
+        тройки сначала упорядочиваются, чтобы отпечаток не зависел от слияния.
+
+        :param rows: номера строк пользователей
+        :param cols: номера столбцов фильмов
+        :param ratings: оценки
+        :return: hex-строка хеша
+        """
+        store = self.dp.rating_store
+        if store.delta_size:
+            order = np.lexsort((cols, rows))
+            rows, cols, ratings = rows[order], cols[order], ratings[order]
+        digest = hashlib.sha256()
+        for array in (store.user_ids[rows].astype(np.int64), store.movie_ids[cols].astype(np.int64),
+                      ratings.astype(np.float32)):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def _hyperparameters(self) -> np.ndarray:
+        """
+        Гиперпараметры, от которых зависят факторы
+
+        :return: массив (num_factors, regularization, iterations, seed)
+        """
+        return np.array([self.num_factors, self.regularization, self.iterations, self.seed], dtype=np.float64)
+
+    def _solve(self, pool: ThreadPoolExecutor, owners: np.ndarray, others: np.ndarray,
+               residuals: np.ndarray, other_factors: np.ndarray, n_owners: int) -> np.ndarray:
+        """
+        Решение регуляризованных МНК для всех строк одной стороны факторизации
+
+        :param pool: пул потоков
+        :param owners: владельцы оценок (пользователи или фильмы), по возрастанию
+        :param others: противоположная сторона для каждой оценки
+        :param residuals: остатки оценок после вычета средних
+        :param other_factors: зафиксированные факторы противоположной стороны
+        :param n_owners: количество владельцев
+        :return: новая матрица факторов n_owners × num_factors
+        """
+        indptr = np.zeros(n_owners + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owners, minlength=n_owners), out=indptr[1:])
+        counts = np.diff(indptr)
+
+        by_count = np.argsort(counts, kind='stable')
+        budget = max(1, 4_000_000 // self.num_factors)
+        chunks, chunk_start = [], 0
+        for i, owner in enumerate(by_count):
+            if (i + 1 - chunk_start) * counts[owner] > budget and i > chunk_start:
+                chunks.append(by_count[chunk_start:i])
+                chunk_start = i
+        chunks.append(by_count[chunk_start:])
+
+        factors = np.zeros((n_owners, self.num_factors))
+
+        def solve_chunk(chunk: np.ndarray) -> None:
+            chunk_counts = counts[chunk]
+            length = int(chunk_counts.max()) if len(chunk) else 0
+            positions = segment_positions(indptr[chunk], chunk_counts)
+            local = np.repeat(np.arange(len(chunk)), chunk_counts)
+            slots = np.arange(len(positions)) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+
+            padded = np.zeros((len(chunk), length, self.num_factors))
+            padded_residuals = np.zeros((len(chunk), length))
+            padded[local, slots] = other_factors[others[positions]]
+            padded_residuals[local, slots] = residuals[positions]
+
+            gram = padded.transpose(0, 2, 1) @ padded
+            gram += (self.regularization * np.maximum(chunk_counts, 1))[:, None, None] * np.eye(self.num_factors)
+            rhs = padded.transpose(0, 2, 1) @ padded_residuals[..., None]
+            factors[chunk] = np.linalg.solve(gram, rhs)[..., 0]
+
+        list(pool.map(solve_chunk, chunks))
+        return factors
+
+    def save(self, path: str) -> None:
+        """
+        Сохранение факторов
+
+        :param path: путь к .npz файлу
+        """
+        np.savez(
+            path,
+            global_mean=self.global_mean,
+            item_bias=self.item_bias,
+            user_factors=self.user_factors,
+            item_factors=self.item_factors,
+            movie_ids=self.movie_ids,
+            fingerprint=self.fingerprint,
+            hyperparameters=self._hyperparameters()
+        )
+
+    def load(self, path: str) -> bool:
+        """
+        Загрузка факторов, если они обучены на тех же оценках с теми же гиперпараметрами
+
+        Оценки сверяются по SHA-256 обучающих троек, поэтому изменение любой оценки
+        при том же их количестве тоже приводит к переобучению.
+
+        :param path: путь к .npz файлу
+        :return: True, если факторы загружены
+        """
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as model:
+            if "fingerprint" not in model.files or "hyperparameters" not in model.files:
+                return False
+            if not np.array_equal(model["hyperparameters"], self._hyperparameters()):
+                return False
+            store = self.dp.rating_store
+            fingerprint = self._fingerprint(*store.gather_rows(np.arange(store.n_users)))
+            if str(model["fingerprint"]) != fingerprint:
+                return False
+            self.global_mean = float(model["global_mean"])
+            self.item_bias = model["item_bias"]
+            self.user_factors = model["user_factors"]
+            self.item_factors = model["item_factors"]
+            self.movie_ids = model["movie_ids"]
+            self.fingerprint = fingerprint
+        return True
+
+    def fit_or_load(self, path: str) -> None:
+        """
+        Загрузить сохранённые факторы или обучить и сохранить новые
+
+        :param path: путь к .npz файлу
+        """
+        if path and self.load(path):
+            print(f"Загружены факторы ALS из {path}")
+            return
+        self.train()
+        if path:
+            self.save(path)
+
+    def fold_in(self, virtual_user_ratings: dict) -> tuple:
+        """
+        Факторы нового пользователя одним маленьким МНК при зафиксированных факторах фильмов
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :return: кортеж (вектор факторов, номера столбцов оценённых фильмов)
+        """
+        movie_index = self.dp.rating_store.movie_index
+        rated = [(movie_index[movie_id], rating) for movie_id, rating in virtual_user_ratings.items()
+                 if movie_id in movie_index and movie_index[movie_id] < len(self.movie_ids)]
+        if not rated:
+            return np.zeros(self.num_factors), np.empty(0, dtype=np.int64)
+
+        cols = np.array([col for col, _ in rated])
+        residuals = np.array([rating for _, rating in rated]) - self.global_mean - self.item_bias[cols]
+        neighbours = self.item_factors[cols]
+        gram = neighbours.T @ neighbours + self.regularization * len(cols) * np.eye(self.num_factors)
+        return np.linalg.solve(gram, neighbours.T @ residuals), cols
+
+    def recommend(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Синхронный расчёт рекомендаций: fold-in и одно умножение матрицы на вектор
+
+        :param virtual_user_ratings: словарь оценок пользователя
+        :param num_recommendations: количество возвращаемых рекомендаций
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        """
+        if self.item_factors is None:
+            self.train()
+
+        metrics.inc("recommendation_requests_total", engine="als")
+        with metrics.span("fold_in", engine="als"):
+            user_vector, rated_cols = self.fold_in(virtual_user_ratings)
+        with metrics.span("aggregation", engine="als"):
+            scores = self.global_mean + self.item_bias + self.item_factors @ user_vector
+            scores[rated_cols] = -np.inf
+
+        count = min(num_recommendations, len(scores) - len(rated_cols))
+        if count <= 0:
+            metrics.inc("empty_recommendations_total", engine="als")
+            return []
+        with metrics.span("ranking", engine="als"):
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.lexsort((top, -scores[top]))]
+            return list(zip(
+                self.movie_ids[top].tolist(),
+                np.clip(scores[top], 1.0, 5.0).tolist()
+            ))
+
+    async def generate_recommendations(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Генерация рекомендаций на основе оценок виртуального пользователя
+        используя матричную факторизацию
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество возвращаемых рекомендаций
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        """
+        return self.recommend(virtual_user_ratings, num_recommendations)
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from data_handler import DataProcessor
+from collab_filtering import CollaborativeFiltering
+
+_engine = None
+
+def _init_worker() -> None:
+    """Инициализация процесса-воркера: подробный вывод движка не нужен в пакетном режиме"""
+    sys.stdout = open(os.devnull, 'w')
+
+def _recommend_chunk(task: tuple) -> list:
+    """
+    Рассчитать рекомендации для части пользователей
+
+    :param task: кортеж (список ID пользователей, количество рекомендаций)
+    :return: список кортежей (ID пользователя, рекомендации)
+    """
+    user_ids, num_recommendations = task
+    results = []
+    for user_id in user_ids:
+        user_ratings = _engine.dp.get_user_ratings(user_id)
+        recommendations = _engine.recommend(user_ratings, num_recommendations, exclude_user_id=user_id)
+        results.append((user_id, recommendations))
+    return results
+
+def run(engine: CollaborativeFiltering, output_path: str, num_recommendations: int,
+        workers: int, chunk_size: int) -> None:
+    """
+    Пакетный расчёт рекомендаций для всех пользователей датасета
+
+    Данные загружаются один раз в родительском процессе и наследуются воркерами
+    через fork без копирования, в задачи передаются только ID пользователей.
+
+    :param engine: движок коллаборативной фильтрации с загруженными данными
+    :param output_path: путь к выходному JSONL-файлу
+    :param num_recommendations: количество рекомендаций на пользователя
+    :param workers: количество процессов
+    :param chunk_size: количество пользователей в одной задаче
+    """
+    global _engine
+    _engine = engine
+
+    user_ids = engine.dp.get_all_users()
+    tasks = [(user_ids[i:i + chunk_size], num_recommendations) for i in range(0, len(user_ids), chunk_size)]
+
+    context = mp.get_context("fork")
+    start = time.perf_counter()
+    processed = 0
+    with context.Pool(workers, initializer=_init_worker) as pool, open(output_path, 'w') as output:
+        for results in pool.imap_unordered(_recommend_chunk, tasks):
+            for user_id, recommendations in results:
+                record = {
+                    "user_id": user_id,
+                    "recommendations": [[movie_id, round(score, 4)] for movie_id, score in recommendations]
+                }
+                output.write(json.dumps(record, separators=(',', ':')) + '\n')
+            processed += len(results)
+            elapsed = time.perf_counter() - start
+            print(f"\rОбработано {processed}/{len(user_ids)} пользователей, "
+                  f"{processed / elapsed:.1f} польз./с", end='', flush=True)
+    print(f"\nГотово за {time.perf_counter() - start:.2f} с, результат в {output_path}")
+
+async def main() -> None:
+    """Точка входа пакетного расчёта рекомендаций"""
+    parser = argparse.ArgumentParser(description="Пакетный расчёт top-N рекомендаций для всех пользователей")
+    parser.add_argument("--output", default="recommendations.jsonl")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=32)
+    args = parser.parse_args()
+
+    data_processor = DataProcessor()
+    await data_processor.load_data()
+    engine = CollaborativeFiltering(data_processor)
+
+    run(engine, args.output, args.top, args.workers, args.chunk_size)
+
+if __name__ == "__main__":
+    asyncio.run(main())
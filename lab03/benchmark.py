@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import random
+import resource
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from data_handler import DataProcessor
+from dataset_loader import detect_layout, read_ratings
+from collab_filtering import CollaborativeFiltering
+from item_filtering import ItemBasedFiltering
+from als_filtering import ALSRecommender
+
+ENGINES = ["user", "item", "als"]
+RATING_SCORES = [5.0, 4.5, 4.0, 3.5, 3.0]
+
+def synthetic_ratings(num_ratings: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Синтетический датасет в формате u.data
+
+    Популярность фильмов и активность пользователей распределены с тяжёлым хвостом,
+    а оценки порождаются скрытыми факторами — так у движков есть что находить.
+
+    :param num_ratings: количество оценок
+    :param seed: зерно генератора
+    :return: DataFrame с колонками user_id, movie_id, rating, timestamp
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(num_ratings // 100, 10)
+    n_movies = max(int(np.sqrt(num_ratings) * 5), 100)
+
+    movie_weights = 1.0 / (np.arange(n_movies) + 10.0) ** 0.9
+    user_weights = rng.lognormal(0.0, 1.0, n_users)
+
+    sample_size = int(num_ratings * 1.3)
+    users = rng.choice(n_users, sample_size, p=user_weights / user_weights.sum())
+    movies = rng.choice(n_movies, sample_size, p=movie_weights / movie_weights.sum())
+    _, first = np.unique(users.astype(np.int64) * n_movies + movies, return_index=True)
+    first = rng.permutation(first)[:num_ratings]
+    users, movies = users[first], movies[first]
+
+    user_factors = rng.normal(0, 0.5, (n_users, 8))
+    movie_factors = rng.normal(0, 0.5, (n_movies, 8))
+    movie_bias = rng.normal(0, 0.5, n_movies)
+    scores = 3.5 + movie_bias[movies] + np.einsum('ij,ij->i', user_factors[users], movie_factors[movies])
+    ratings = np.clip(np.rint(scores + rng.normal(0, 0.5, len(users))), 1, 5)
+
+    return pd.DataFrame({
+        "user_id": users.astype(np.int64) + 1,
+        "movie_id": movies.astype(np.int64) + 1,
+        "rating": ratings.astype(np.int64),
+        "timestamp": rng.integers(874_000_000, 893_000_000, len(users))
+    })
+
+def sample_virtual_users(data_processor: DataProcessor, count: int, seed: int) -> list:
+    """
+    Сгенерировать виртуальных пользователей так же, как это делает бот
+
+    :param data_processor: обработчик данных с загруженным датасетом
+    :param count: количество виртуальных пользователей
+    :param seed: зерно генератора
+    :return: список словарей {movie_id: rating}
+    """
+    rnd = random.Random(seed)
+    popular_movies = data_processor.movie_catalog.get_popular_movies(50)
+    return [dict(zip(rnd.sample(popular_movies, len(RATING_SCORES)), RATING_SCORES)) for _ in range(count)]
+
+def build_engine(name: str, data_processor: DataProcessor, seed: int = 0):
+    """
+    Создать и подготовить движок так же, как это делает бот
+
+    :param name: user, item или als
+    :param data_processor: обработчик данных с загруженными оценками
+    :param seed: зерно для ALS
+    :return: движок с синхронным методом recommend
+    """
+    if name == "item":
+        engine = ItemBasedFiltering(data_processor, data_processor.config["item_neighbours"])
+        engine.build_neighbours()
+    elif name == "als":
+        engine = ALSRecommender(
+            data_processor,
+            data_processor.config["als_factors"],
+            data_processor.config["als_regularization"],
+            data_processor.config["als_iterations"],
+            data_processor.config["als_threads"],
+            seed
+        )
+        engine.train()
+    else:
+        engine = CollaborativeFiltering(data_processor)
+    return engine
+
+def recommend(engine, virtual_user_ratings: dict, num_recommendations: int, user_id: int = None) -> list:
+    """
+    Вызов движка без вывода в консоль
+
+    :param engine: движок рекомендаций
+    :param virtual_user_ratings: словарь оценок пользователя
+    :param num_recommendations: количество рекомендаций
+    :param user_id: ID реального пользователя, которого User-Based движку нельзя брать в соседи
+    :return: список кортежей c id фильмов и предсказанными рейтингами
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        if isinstance(engine, CollaborativeFiltering):
+            return engine.recommend(virtual_user_ratings, num_recommendations, exclude_user_id=user_id)
+        return engine.recommend(virtual_user_ratings, num_recommendations)
+
+def measure_build(name: str, data_processor: DataProcessor, seed: int) -> tuple:
+    """
+    Построить движок с замером времени и пикового объёма выделенной памяти
+
+    :param name: название движка
+    :param data_processor: обработчик данных с загруженными оценками
+    :param seed: зерно для ALS
+    :return: кортеж (движок, время в секундах, пик памяти в МБ)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = build_engine(name, data_processor, seed)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return engine, elapsed, peak / 2 ** 20
+
+def measure_latency(engine, virtual_users: list) -> dict:
+    """
+    Задержка и пропускная способность на запросах, сгенерированных как в боте
+
+    :param engine: движок рекомендаций
+    :param virtual_users: список виртуальных пользователей
+    :return: словарь с перцентилями задержки в мс и запросами в секунду
+    """
+    latencies = []
+    start = time.perf_counter()
+    for virtual_user_ratings in virtual_users:
+        query_start = time.perf_counter()
+        recommend(engine, virtual_user_ratings, 5)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        "queries": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "max_ms": float(np.max(latencies)),
+        "qps": len(latencies) / elapsed if elapsed > 0 else 0.0
+    }
+
+def measure_query_memory(engine, virtual_users: list) -> float:
+    """
+    Пиковый объём памяти, выделяемой generate_recommendations на запросах
+
+    Отдельный проход: под tracemalloc запросы заметно медленнее, поэтому задержка
+    меряется без него. Трассировка начинается после построения движка, так что
+    в пик входят только временные массивы запросов.
+
+    :param engine: движок рекомендаций
+    :param virtual_users: список виртуальных пользователей
+    :return: пик памяти в МБ
+    """
+    tracemalloc.start()
+    for virtual_user_ratings in virtual_users:
+        recommend(engine, virtual_user_ratings, 5)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+def time_split(ratings_df: pd.DataFrame, train_fraction: float = 0.8) -> tuple:
+    """
+    Разбиение по времени: всё до квантиля timestamp — обучение, после — тест
+
+    В тест попадают только пользователи, у которых есть оценки в обучении,
+    иначе движку не на чем строить рекомендации.
+
+    :param ratings_df: таблица оценок
+    :param train_fraction: доля оценок в обучении
+    :return: кортеж (train_df, test_df)
+    """
+    threshold = ratings_df["timestamp"].quantile(train_fraction)
+    is_train = ratings_df["timestamp"] <= threshold
+    train_df = ratings_df[is_train].reset_index(drop=True)
+    test_df = ratings_df[~is_train]
+    test_df = test_df[test_df["user_id"].isin(train_df["user_id"].unique())].reset_index(drop=True)
+    return train_df, test_df
+
+def evaluate(engine, data_processor: DataProcessor, test_df: pd.DataFrame, num_users: int,
+             k: int = 10, seed: int = 0) -> dict:
+    """
+    Офлайн-оценка качества на отложенных по времени оценках
+
+    Для каждого тестового пользователя движок получает его оценки из обучения
+    как виртуального пользователя и ранжирует все фильмы. RMSE считается по тестовым
+    парам, для которых движок смог дать предсказание, релевантными для precision@k
+    считаются тестовые оценки от 4.
+
+    :param engine: движок рекомендаций
+    :param data_processor: обработчик данных, загруженный обучающей частью
+    :param test_df: тестовые оценки
+    :param num_users: максимальное количество тестовых пользователей
+    :param k: длина списка рекомендаций для precision@k
+    :param seed: зерно выбора пользователей
+    :return: словарь с RMSE, precision@k и покрытием
+    """
+    rng = np.random.default_rng(seed)
+    test_users = test_df["user_id"].unique()
+    test_users = np.sort(rng.permutation(test_users)[:num_users])
+    store = data_processor.rating_store
+
+    squared_errors, hits, covered, total = [], 0, 0, 0
+    recommended_movies = set()
+    for user_id, user_test in test_df[test_df["user_id"].isin(test_users)].groupby("user_id"):
+        virtual_user_ratings = data_processor.get_user_ratings(int(user_id))
+        predictions = dict(recommend(engine, virtual_user_ratings, store.n_movies, int(user_id)))
+        ranked = list(predictions)[:k]
+        recommended_movies.update(ranked)
+
+        relevant = set(user_test.loc[user_test["rating"] >= 4, "movie_id"].tolist())
+        hits += len(relevant.intersection(ranked))
+        for movie_id, rating in zip(user_test["movie_id"].tolist(), user_test["rating"].tolist()):
+            total += 1
+            if movie_id in predictions:
+                covered += 1
+                squared_errors.append((predictions[movie_id] - rating) ** 2)
+
+    return {
+        "users": len(test_users),
+        "test_ratings": total,
+        "rmse": float(np.sqrt(np.mean(squared_errors))) if squared_errors else None,
+        f"precision_at_{k}": hits / (k * len(test_users)) if len(test_users) else 0.0,
+        "prediction_coverage": covered / total if total else 0.0,
+        "catalog_coverage": len(recommended_movies) / store.n_movies if store.n_movies else 0.0
+    }
+
+async def run_dataset(name: str, ratings_df: pd.DataFrame, engines: list, args: argparse.Namespace) -> dict:
+    """
+    Полный прогон одного датасета: производительность на всех оценках и качество на разбиении по времени
+
+    :param name: название датасета в отчёте
+    :param ratings_df: таблица оценок
+    :param engines: список движков
+    :param args: аргументы командной строки
+    :return: словарь с результатами по движкам
+    """
+    print(f"=== {name}: {len(ratings_df)} оценок ===")
+    result = {"ratings": len(ratings_df), "engines": {}}
+
+    data_processor = DataProcessor()
+    start = time.perf_counter()
+    await data_processor.load_ratings(ratings_df)
+    result["load_s"] = time.perf_counter() - start
+    result["users"] = data_processor.rating_store.n_users
+    result["movies"] = data_processor.rating_store.n_movies
+    virtual_users = sample_virtual_users(data_processor, args.queries, args.seed)
+
+    train_df, test_df = time_split(ratings_df, args.train_fraction)
+    eval_processor = DataProcessor()
+    await eval_processor.load_ratings(train_df)
+
+    for engine_name in engines:
+        engine, build_s, build_peak_mb = measure_build(engine_name, data_processor, args.seed)
+        performance = measure_latency(engine, virtual_users)
+        query_peak_mb = measure_query_memory(engine, virtual_users)
+        del engine
+
+        eval_engine, _, _ = measure_build(engine_name, eval_processor, args.seed)
+        quality = evaluate(eval_engine, eval_processor, test_df, args.eval_users, args.k, args.seed)
+        del eval_engine
+
+        result["engines"][engine_name] = {
+            "build_s": build_s,
+            "build_peak_mb": build_peak_mb,
+            "query_peak_mb": query_peak_mb,
+            **performance,
+            **quality
+        }
+        print(f"{engine_name:>6}: build {build_s:7.2f} s, peak {build_peak_mb:8.1f} MB, "
+              f"query peak {query_peak_mb:6.1f} MB, p50 {performance['p50_ms']:8.2f} ms, p95 {performance['p95_ms']:8.2f} ms, "
+              f"{performance['qps']:8.1f} q/s, RMSE {quality['rmse'] if quality['rmse'] is not None else float('nan'):.4f}, "
+              f"P@{args.k} {quality[f'precision_at_{args.k}']:.4f}, "
+              f"coverage {quality['prediction_coverage']:.3f}/{quality['catalog_coverage']:.3f}")
+    return result
+
+def compare(current: dict, previous: dict) -> None:
+    """
+    Вывести изменение задержек относительно предыдущего прогона
+
+    :param current: текущие результаты
+    :param previous: результаты из сохранённого JSON
+    """
+    print("=== Сравнение с предыдущим прогоном ===")
+    for dataset, result in current["datasets"].items():
+        for engine_name, metrics in result["engines"].items():
+            old = previous.get("datasets", {}).get(dataset, {}).get("engines", {}).get(engine_name)
+            if old is None:
+                continue
+            changes = ", ".join(
+                f"{metric} {old[metric]:.2f} → {metrics[metric]:.2f}"
+                for metric in ("p50_ms", "p95_ms", "build_s", "query_peak_mb") if metric in old
+            )
+            print(f"{dataset} / {engine_name}: {changes}")
+
+async def main() -> None:
+    """Бенчмарк задержки, памяти и офлайн-качества движков рекомендаций"""
+    parser = argparse.ArgumentParser(description="Бенчмарк и офлайн-оценка движков рекомендаций")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--scales", type=int, nargs="*", default=[100_000, 1_000_000, 10_000_000],
+                        help="размеры синтетических датасетов в оценках")
+    parser.add_argument("--skip-dataset", action="store_true", help="не прогонять датасет из DATASET_PATH")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--eval-users", type=int, default=200)
+    parser.add_argument("--train-fraction", type=float, default=0.8)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="JSON предыдущего прогона")
+    args = parser.parse_args()
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "args": vars(args),
+        "datasets": {}
+    }
+
+    if not args.skip_dataset:
+        config = DataProcessor().config
+        dataset_path = config["dataset_path"]
+        layout_name = detect_layout(dataset_path, config["dataset_format"])
+        ratings_df = read_ratings(dataset_path, layout_name, config["load_chunk_size"])
+        results["datasets"][layout_name] = await run_dataset(layout_name, ratings_df, args.engines, args)
+
+    for scale in args.scales:
+        ratings_df = synthetic_ratings(scale, args.seed)
+        results["datasets"][f"synthetic_{scale}"] = await run_dataset(
+            f"synthetic {scale}", ratings_df, args.engines, args
+        )
+        del ratings_df
+
+    results["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Пиковый RSS процесса: {results['max_rss_mb']:.1f} MB")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    asyncio.run(main())
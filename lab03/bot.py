@@ -1,31 +1,64 @@
 import asyncio
+import logging
 from aiogram import Bot, Dispatcher
 from aiogram.types import Message
 from aiogram.filters import Command, CommandStart
 from data_handler import DataProcessor
 from collab_filtering import CollaborativeFiltering
+from item_filtering import ItemBasedFiltering
+from als_filtering import ALSRecommender
+from sharded_similarity import ShardedUserSimilarity
+from recommendation_executor import RecommendationExecutor, ExecutorOverloadedError
+from recommendation_cache import RecommendationCache
+from metrics import metrics, start_metrics_server
+from session_store import Session, SessionStore, SQLiteSessionStore
+from webhook import run_webhook, run_workers
 from config import get_config
 import random
 
 config = get_config()
+logging.basicConfig(level=config["log_level"], format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 bot = Bot(token=config["tg_token"])
 dp = Dispatcher()
 
 data_processor = DataProcessor()
-cf_engine = CollaborativeFiltering(data_processor)
+if config["cf_engine"] == "item":
+    cf_engine = ItemBasedFiltering(data_processor, config["item_neighbours"])
+elif config["cf_engine"] == "als":
+    cf_engine = ALSRecommender(
+        data_processor,
+        config["als_factors"],
+        config["als_regularization"],
+        config["als_iterations"],
+        config["als_threads"]
+    )
+else:
+    cf_engine = CollaborativeFiltering(data_processor)
+
+recommendation_executor = RecommendationExecutor(
+    cf_engine,
+    config["executor_mode"],
+    config["executor_workers"],
+    config["executor_queue"],
+    config["executor_timeout"]
+)
+
+recommendation_cache = RecommendationCache(cf_engine, config["cache_size"])
 
-user_sessions = {}
+RANKING_POOL_SIZE = 50
+RATING_SCORES = [5.0, 4.5, 4.0, 3.5, 3.0]
+
+if config["session_backend"] == "sqlite":
+    user_sessions = SQLiteSessionStore(config["session_db_path"], config["session_max_size"], config["session_ttl"])
+else:
+    user_sessions = SessionStore(config["session_max_size"], config["session_ttl"])
 
 @dp.message(CommandStart())
 async def start_command(message: Message) -> None:
     """Обработчик команды /start"""
-    user_sessions[message.from_user.id] = {
-        'step': 'awaiting_ranking',
-        'movies_to_rank': []
-    }
-    
     movies_to_rank = await get_movies_for_ranking(5)
-    user_sessions[message.from_user.id]['movies_to_rank'] = movies_to_rank
+    user_sessions.put(message.from_user.id, Session('awaiting_ranking', movies_to_rank))
     
     response = (
         "Привет! Я бот для рекомендации фильмов.\n\n"
@@ -50,18 +83,33 @@ async def get_movies_for_ranking(count: int = 5) -> list:
     :param count: количество фильмов для выбора
     :return: список кортежей (movie_id, title)
     """
-    movie_ratings_count = data_processor.ratings_df.groupby('movie_id').size()
-    popular_movies_ids = movie_ratings_count.nlargest(50).index.tolist()
+    popular_movies_ids = data_processor.movie_catalog.get_popular_movies(RANKING_POOL_SIZE)
     
     selected_movies = random.sample(popular_movies_ids, count)
     
     movies_with_titles = []
     for movie_id in selected_movies:
-        title = data_processor.get_movie_title(movie_id)
+        title = data_processor.movie_catalog.get_title(movie_id)
         movies_with_titles.append((movie_id, title))
     
     return movies_with_titles
 
+@dp.message(Command("cachestats"))
+async def cache_stats_command(message: Message) -> None:
+    """Обработчик команды /cachestats со статистикой кэша рекомендаций"""
+    stats = recommendation_cache.stats()
+    await message.answer(
+        f"Кэш рекомендаций: {stats['size']}/{stats['max_size']}\n"
+        f"Попаданий: {stats['hits']}, промахов: {stats['misses']} "
+        f"({stats['hit_rate']:.1%})\n"
+        f"Вытеснений: {stats['evictions']}, сбросов: {stats['invalidations']}"
+    )
+    session_stats = user_sessions.stats()
+    await message.answer(
+        f"Сессии: {session_stats['size']}/{session_stats['max_size']}\n"
+        f"Вытеснено по LRU: {session_stats['evicted_lru']}, по простою: {session_stats['evicted_ttl']}"
+    )
+
 @dp.message()
 async def handle_movie_ranking(message: Message) -> None:
     """
@@ -70,20 +118,19 @@ async def handle_movie_ranking(message: Message) -> None:
     :param message: сообщение от пользователя с порядком фильмов
     """
     user_id = message.from_user.id
+    user_session = user_sessions.get(user_id)
     
-    if user_id not in user_sessions:
+    if user_session is None:
         await start_command(message)
         return
     
-    user_session = user_sessions[user_id]
-    
-    if user_session['step'] != 'awaiting_ranking':
+    if user_session.step != 'awaiting_ranking':
         await message.answer("Пожалуйста, начните с команды /start")
         return
     
     try:
         ranking = [int(x.strip()) for x in message.text.split(',')]
-        movies_to_rank = user_session['movies_to_rank']
+        movies_to_rank = user_session.movies_to_rank
         
         if (len(ranking) != len(movies_to_rank) or 
             not all(1 <= num <= len(movies_to_rank) for num in ranking) or
@@ -97,43 +144,131 @@ async def handle_movie_ranking(message: Message) -> None:
         
         virtual_user_ratings = {}
         
-        rating_scores = [5.0, 4.5, 4.0, 3.5, 3.0]
-        
         for position, movie_rank in enumerate(ranking):
             movie_index = movie_rank - 1
             movie_id, title = movies_to_rank[movie_index]
-            rating = rating_scores[position]
+            rating = RATING_SCORES[position]
             virtual_user_ratings[movie_id] = rating
             
-            print(f"Пользователь поставил фильму '{title}' позицию {position+1} → оценка {rating}")
+            logger.debug("Пользователь поставил фильму '%s' позицию %d → оценка %s", title, position + 1, rating)
         
         await message.answer(
             "Отлично! Ты расставил фильмы по предпочтениям.\n"
             "Сейчас подберу рекомендации на основе твоего выбора..."
         )
         
-        recommendations = await cf_engine.generate_recommendations(virtual_user_ratings)
+        recommendations = recommendation_cache.lookup(virtual_user_ratings)
+        metrics.inc("recommendation_cache_total", result="miss" if recommendations is None else "hit")
+        if recommendations is None:
+            data_version = data_processor.data_version
+            try:
+                with metrics.span("request"):
+                    recommendations = await recommendation_executor.submit(virtual_user_ratings)
+            except ExecutorOverloadedError:
+                await message.answer("Сейчас слишком много запросов, попробуй отправить порядок ещё раз чуть позже.")
+                return
+            except TimeoutError:
+                await message.answer("Подбор рекомендаций занял слишком много времени, попробуй ещё раз.")
+                return
+            finally:
+                metrics.set("executor_pending", recommendation_executor.pending)
+            recommendation_cache.store(virtual_user_ratings, 5, recommendations, data_version)
         
         if recommendations:
             response = "Вот что тебе может понравиться:\n\n"
             for i, (movie_id, score) in enumerate(recommendations, 1):
-                title = data_processor.get_movie_title(movie_id)
+                title = data_processor.movie_catalog.get_title(movie_id)
                 response += f"{i}. {title} (возможно вы оцените на: {score:.2f})\n"
         else:
             response = "К сожалению, не удалось найти рекомендации. Попробуй выбрать другие фильмы."
         
         await message.answer(response)
         
-        del user_sessions[user_id]
+        if config["record_rankings"]:
+            await data_processor.add_user(virtual_user_ratings)
+        
+        user_sessions.delete(user_id)
         
     except ValueError:
         await message.answer("Пожалуйста, введите числа через запятую. Например: 3, 1, 5, 2, 4")
 
+async def dump_metrics_periodically(path: str, interval: float) -> None:
+    """
+    Периодическая запись метрик в файл
+    
+    :param path: путь к .prom файлу
+    :param interval: период записи в секундах
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(metrics.dump, path)
+        except OSError as e:
+            logger.warning("Ошибка записи метрик: %s", e)
+
+async def purge_sessions_periodically(interval: float) -> None:
+    """
+    Периодическое удаление простаивающих сессий
+    
+    :param interval: период проверки в секундах
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(user_sessions.purge_expired)
+        metrics.set("sessions", len(user_sessions))
+
 async def main() -> None:
     """Запуск бота"""
     await data_processor.load_data()
+    if isinstance(cf_engine, ItemBasedFiltering):
+        cf_engine.build_neighbours()
+    elif isinstance(cf_engine, ALSRecommender):
+        cf_engine.fit_or_load(config["als_model_path"])
+    elif config["user_shards"] > 1:
+        cf_engine.shard_pool = ShardedUserSimilarity(data_processor, config["user_shards"])
+        cf_engine.shard_pool.start()
+    await recommendation_executor.start()
+    if config["cache_warmup"] > 0:
+        asyncio.create_task(asyncio.to_thread(
+            recommendation_cache.warm_up,
+            data_processor.movie_catalog.get_popular_movies(RANKING_POOL_SIZE),
+            RATING_SCORES,
+            config["cache_warmup"]
+        ))
+    metrics_runner = None
+    if config["metrics_port"]:
+        metrics_port = config["metrics_port"] + config["webhook_worker_index"]
+        metrics_runner = await start_metrics_server(metrics, config["metrics_host"], metrics_port)
+        print(f"Метрики доступны на http://{config['metrics_host']}:{metrics_port}/metrics")
+    dump_task = None
+    dump_path = config["metrics_dump_path"]
+    if dump_path and config["webhook_worker_index"]:
+        dump_path = f"{dump_path}.{config['webhook_worker_index']}"
+    if dump_path:
+        dump_task = asyncio.create_task(dump_metrics_periodically(dump_path, config["metrics_dump_interval"]))
+    purge_task = asyncio.create_task(purge_sessions_periodically(max(config["session_ttl"] / 4, 1.0)))
     print("Данные загружены, бот запускается...")
-    await dp.start_polling(bot)
+    try:
+        if config["bot_mode"] == "webhook":
+            await run_webhook(bot, dp, config)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        purge_task.cancel()
+        user_sessions.close()
+        await recommendation_executor.shutdown()
+        if isinstance(cf_engine, CollaborativeFiltering) and cf_engine.shard_pool is not None:
+            cf_engine.shard_pool.close()
+        if dump_task is not None:
+            dump_task.cancel()
+            metrics.dump(dump_path)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if config["bot_mode"] == "webhook" and config["webhook_workers"] > 1:
+        if config["session_backend"] != "sqlite":
+            logger.warning("Несколько процессов с SESSION_BACKEND=memory не разделяют сессии, нужен sqlite")
+        run_workers(__file__, config["webhook_workers"])
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,5 +1,10 @@
+import logging
+import numpy as np
 from data_handler import DataProcessor
-from similarity import cosine_similarity
+from metrics import metrics
+from similarity import batch_cosine_similarity, select_top_neighbours
+
+logger = logging.getLogger(__name__)
 
 class CollaborativeFiltering:
     def __init__(self, data_processor: DataProcessor) -> None:
@@ -9,6 +14,7 @@ class CollaborativeFiltering:
         :param data_processor: обработчик данных для работы с оценками пользователей
         """
         self.dp = data_processor
+        self.shard_pool = None
     
     async def generate_recommendations(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
         """
@@ -19,83 +25,103 @@ class CollaborativeFiltering:
         :param num_recommendations: количество возвращаемых рекомендаций
         :return: список кортежей c id фильмов и предсказанными рейтингами
         """
-        print(f"ВИРТУАЛЬНЫЙ ПОЛЬЗОВАТЕЛЬ с разнообразными оценками:")
-        for movie_id, rating in virtual_user_ratings.items():
-            title = self.dp.get_movie_title(movie_id)
-            print(f"   - {movie_id}: {title} = {rating}")
-        
-        candidate_users = set()
-        for movie_id in virtual_user_ratings.keys():
-            movie_ratings = self.dp.ratings_df[self.dp.ratings_df['movie_id'] == movie_id]
-            users_who_watched = set(movie_ratings['user_id'].tolist())
-            candidate_users.update(users_who_watched)
-        
-        if len(candidate_users) < 50:
-            user_activity = self.dp.ratings_df.groupby('user_id').size()
-            active_users = user_activity.nlargest(100).index.tolist()
-            candidate_users.update(active_users)
-        
-        print(f"Кандидатов для сравнения: {len(candidate_users)} пользователей")
-        
-        similar_users = []
-        for real_user_id in candidate_users:
-            real_user_ratings = self.dp.get_user_ratings(real_user_id)
-            
-            common_movies = set(virtual_user_ratings.keys()) & set(real_user_ratings.keys())
-            if len(common_movies) < 3:
-                continue
-                
-            similarity = cosine_similarity(virtual_user_ratings, real_user_ratings)
-            
-            if similarity > 0.1:
-                similar_users.append((real_user_id, similarity))
-        
-        similar_users.sort(key=lambda x: x[1], reverse=True)
-        similar_users = similar_users[:20]
-        
-        print(f"Найдено похожих пользователей: {len(similar_users)}")
-        for i, (user_id, sim) in enumerate(similar_users[:5], 1):
-            print(f"   {i}. User {user_id}: сходство {sim:.3f}")
+        return self.recommend(virtual_user_ratings, num_recommendations)
+    
+    def recommend(self, virtual_user_ratings: dict, num_recommendations: int = 5, exclude_user_id: int = None) -> list:
+        """
+        Синхронный расчёт рекомендаций User-Based Collaborative Filtering
         
-        if not similar_users:
-            print("Нет похожих пользователей")
+        :param virtual_user_ratings: словарь оценок пользователя
+        :param num_recommendations: количество возвращаемых рекомендаций
+        :param exclude_user_id: ID реального пользователя, которого нельзя брать в соседи
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("ВИРТУАЛЬНЫЙ ПОЛЬЗОВАТЕЛЬ с разнообразными оценками:")
+            for movie_id, rating in virtual_user_ratings.items():
+                logger.debug("   - %s: %s = %s", movie_id, self.dp.movie_catalog.get_title(movie_id), rating)
+        
+        metrics.inc("recommendation_requests_total", engine="user")
+        store = self.dp.rating_store
+        exclude_rows = [store.user_index[exclude_user_id]] if exclude_user_id in store.user_index else []
+        neighbour_rows, neighbour_similarities = self.find_neighbours(virtual_user_ratings, exclude_rows=exclude_rows)
+        
+        metrics.inc("neighbour_users_total", len(neighbour_rows), engine="user")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Найдено похожих пользователей: %d", len(neighbour_rows))
+            for i, (row, sim) in enumerate(zip(neighbour_rows[:5], neighbour_similarities[:5]), 1):
+                logger.debug("   %d. User %d: сходство %.3f", i, store.user_ids[row], sim)
+        
+        if len(neighbour_rows) == 0:
+            logger.debug("Нет похожих пользователей")
+            metrics.inc("empty_recommendations_total", engine="user")
             return []
         
-        movie_scores = {}
-        watched_movies = set(virtual_user_ratings.keys())
-        
-        for similar_user_id, similarity in similar_users:
-            similar_user_ratings = self.dp.get_user_ratings(similar_user_id)
+        with metrics.span("aggregation", engine="user"):
+            neighbour_ratings = store.dense_rows(neighbour_rows)
+            watched_cols = [store.movie_index[movie_id] for movie_id in virtual_user_ratings if movie_id in store.movie_index]
+            neighbour_ratings[:, watched_cols] = 0
+            rated = neighbour_ratings > 0
             
-            for movie_id, rating in similar_user_ratings.items():
-                if movie_id not in watched_movies:
-                    if movie_id not in movie_scores:
-                        movie_scores[movie_id] = []
-                    movie_scores[movie_id].append((rating, similarity))
+            weights = neighbour_similarities[:, None]
+            total_weighted_score = (neighbour_ratings * weights).sum(axis=0)
+            total_similarity = (rated * weights).sum(axis=0)
+            predicted_cols = np.flatnonzero((rated.sum(axis=0) >= 2) & (total_similarity > 0))
+            predicted = np.clip(total_weighted_score[predicted_cols] / total_similarity[predicted_cols], 1.0, 5.0)
+        
+        metrics.inc("predicted_movies_total", len(predicted_cols), engine="user")
+        logger.debug("Рассчитано рейтингов: %d", len(predicted_cols))
+        
+        with metrics.span("ranking", engine="user"):
+            first_seen = rated[:, predicted_cols].argmax(axis=0)
+            order = np.lexsort((predicted_cols, first_seen, -predicted))[:num_recommendations]
+            top_recommendations = list(zip(
+                store.movie_ids[predicted_cols[order]].tolist(),
+                predicted[order].tolist()
+            ))
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Топ рекомендации:")
+            for i, (movie_id, rating) in enumerate(top_recommendations, 1):
+                logger.debug("   %d. %s: %.2f", i, self.dp.movie_catalog.get_title(movie_id), rating)
         
-        print(f"Собрано оценок для {len(movie_scores)} фильмов")
+        return top_recommendations
+    
+    def find_neighbours(self, virtual_user_ratings: dict, num_neighbours: int = 20, exclude_rows: list = ()) -> tuple:
+        """
+        Поиск самых похожих пользователей среди кандидатов
         
-        predicted_ratings = []
-        for movie_id, scores in movie_scores.items():
-            if len(scores) < 2:
-                continue
-                
-            total_weighted_score = sum(rating * similarity for rating, similarity in scores)
-            total_similarity = sum(similarity for _, similarity in scores)
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_neighbours: количество соседей
+        :param exclude_rows: строки пользователей, исключаемые из кандидатов
+        :return: кортеж (строки соседей, их сходства) по убыванию сходства
+        """
+        if self.shard_pool is not None and self.shard_pool.is_usable():
+            with metrics.span("sharded_neighbours", engine="user"):
+                return self.shard_pool.find_neighbours(virtual_user_ratings, num_neighbours, exclude_rows)
+        
+        store = self.dp.rating_store
+        with metrics.span("similarity", engine="user"):
+            similarities, common_counts = batch_cosine_similarity(store, virtual_user_ratings, min_common=3)
+        
+        with metrics.span("neighbour_selection", engine="user"):
+            candidate_mask = common_counts >= 3
+            num_candidates = int(candidate_mask.sum())
+            metrics.inc("candidate_users_total", num_candidates, engine="user")
+            logger.debug("Кандидатов для сравнения: %d пользователей", num_candidates)
             
-            if total_similarity > 0:
-                predicted_rating = total_weighted_score / total_similarity
-                predicted_rating = max(1.0, min(5.0, predicted_rating))
-                predicted_ratings.append((movie_id, predicted_rating))
-        
-        print(f"Рассчитано рейтингов: {len(predicted_ratings)}")
-        
-        predicted_ratings.sort(key=lambda x: x[1], reverse=True)
-        top_recommendations = predicted_ratings[:num_recommendations]
-        
-        print("Топ рекомендации:")
-        for i, (movie_id, rating) in enumerate(top_recommendations, 1):
-            title = self.dp.get_movie_title(movie_id)
-            print(f"   {i}. {title}: {rating:.2f}")
+            candidate_mask[list(exclude_rows)] = False
+            eligible_rows = np.flatnonzero(candidate_mask & (similarities > 0.1))
+            return self._select_neighbours(eligible_rows, similarities[eligible_rows], num_neighbours)
+    
+    @staticmethod
+    def _select_neighbours(rows: np.ndarray, similarities: np.ndarray, k: int) -> tuple:
+        """
+        Выбор k самых похожих пользователей без полной сортировки
         
-        return top_recommendations
+        :param rows: номера строк пользователей-кандидатов по возрастанию
+        :param similarities: сходство кандидатов с виртуальным пользователем
+        :param k: количество соседей
+        :return: кортеж (строки соседей, их сходства) по убыванию сходства
+        """
+        return select_top_neighbours(rows, similarities, k)
@@ -6,9 +6,48 @@ load_dotenv()
 def get_config() -> dict:
     """
     Возвращает конфигурацию тг-бота и датасет
-    :return: Токен и путь до датасета.
+    :return: Токен, путь до датасета и настройки рекомендательного движка.
     """
     return {
         "tg_token": os.getenv("TELEGRAM_TOKEN"),
-        "dataset_path": os.getenv("DATASET_PATH", "data/u.data")
+        "dataset_path": os.getenv("DATASET_PATH", "data/u.data"),
+        "dataset_format": os.getenv("DATASET_FORMAT", "auto"),
+        "load_chunk_size": int(os.getenv("LOAD_CHUNK_SIZE", "1000000")),
+        "snapshot_dir": os.getenv("SNAPSHOT_DIR", "data/snapshot"),
+        "cf_engine": os.getenv("CF_ENGINE", "user"),
+        "item_neighbours": int(os.getenv("ITEM_NEIGHBOURS", "50")),
+        "als_factors": int(os.getenv("ALS_FACTORS", "32")),
+        "als_regularization": float(os.getenv("ALS_REGULARIZATION", "0.1")),
+        "als_iterations": int(os.getenv("ALS_ITERATIONS", "10")),
+        "als_threads": int(os.getenv("ALS_THREADS", "4")),
+        "als_model_path": os.getenv("ALS_MODEL_PATH", "data/als_model.npz"),
+        "user_shards": int(os.getenv("USER_SHARDS", "0")),
+        "executor_mode": os.getenv("EXECUTOR_MODE", "thread"),
+        "executor_workers": int(os.getenv("EXECUTOR_WORKERS", "2")),
+        "executor_queue": int(os.getenv("EXECUTOR_QUEUE", "32")),
+        "executor_timeout": float(os.getenv("EXECUTOR_TIMEOUT", "10")),
+        "cache_size": int(os.getenv("CACHE_SIZE", "4096")),
+        "cache_warmup": int(os.getenv("CACHE_WARMUP", "0")),
+        "record_rankings": os.getenv("RECORD_RANKINGS", "0") == "1",
+        "compact_threshold": int(os.getenv("COMPACT_THRESHOLD", "10000")),
+        "session_backend": os.getenv("SESSION_BACKEND", "memory"),
+        "session_db_path": os.getenv("SESSION_DB_PATH", "data/sessions.sqlite3"),
+        "session_max_size": int(os.getenv("SESSION_MAX_SIZE", "10000")),
+        "session_ttl": float(os.getenv("SESSION_TTL", "1800")),
+        "bot_mode": os.getenv("BOT_MODE", "polling"),
+        "webhook_url": os.getenv("WEBHOOK_URL", ""),
+        "webhook_path": os.getenv("WEBHOOK_PATH", "/telegram"),
+        "webhook_secret": os.getenv("WEBHOOK_SECRET", ""),
+        "webhook_host": os.getenv("WEBHOOK_HOST", "127.0.0.1"),
+        "webhook_port": int(os.getenv("WEBHOOK_PORT", "8081")),
+        "webhook_concurrency": int(os.getenv("WEBHOOK_CONCURRENCY", "8")),
+        "webhook_queue": int(os.getenv("WEBHOOK_QUEUE", "256")),
+        "webhook_workers": int(os.getenv("WEBHOOK_WORKERS", "1")),
+        "webhook_worker_index": int(os.getenv("WEBHOOK_WORKER_INDEX", "0")),
+        "webhook_shutdown_timeout": float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT", "30")),
+        "log_level": os.getenv("LOG_LEVEL", "INFO"),
+        "metrics_host": os.getenv("METRICS_HOST", "127.0.0.1"),
+        "metrics_port": int(os.getenv("METRICS_PORT", "0")),
+        "metrics_dump_path": os.getenv("METRICS_DUMP_PATH", ""),
+        "metrics_dump_interval": float(os.getenv("METRICS_DUMP_INTERVAL", "15"))
     }
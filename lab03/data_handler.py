@@ -1,5 +1,12 @@
+import asyncio
+import time
 import pandas as pd
 from config import get_config
+from dataset_loader import detect_layout, movies_path_for, read_movies, read_ratings
+from metrics import metrics
+from movie_catalog import MovieCatalog
+from rating_store import RatingStore
+from snapshot import load_snapshot, save_snapshot
 
 class DataProcessor:
     def __init__(self) -> None:
@@ -8,43 +15,136 @@ class DataProcessor:
         """
         self.config = get_config()
         self.ratings_df = None
-        self.user_item_table = None
-        self.movie_titles = None
+        self.rating_store = None
+        self.movie_catalog = None
+        self.data_version = 0
+        self.pending_ratings = []
+        self._write_lock = asyncio.Lock()
     
     async def load_data(self) -> None:
-        """Асинхронная загрузка данных из датасета"""
-        self.ratings_df = pd.read_csv(
-            self.config["dataset_path"], 
-            sep='\t',
-            names=['user_id', 'movie_id', 'rating', 'timestamp']
-        )
+        """Асинхронная загрузка данных из датасета или его актуального снимка"""
+        dataset_path = self.config["dataset_path"]
+        layout_name = detect_layout(dataset_path, self.config["dataset_format"])
+        movies_path = movies_path_for(dataset_path, layout_name)
+        source_paths = [dataset_path, movies_path]
+        snapshot_dir = self.config["snapshot_dir"]
         
-        dataset_dir = '/'.join(self.config["dataset_path"].split('/')[:-1])
-        movies_path = f"{dataset_dir}/u.item"
+        with metrics.span("snapshot_load"):
+            snapshot_loaded = bool(snapshot_dir) and load_snapshot(self, snapshot_dir, source_paths)
+        if snapshot_loaded:
+            self.data_version += 1
+            metrics.set("loaded_ratings", self.rating_store.nnz)
+            print(f"Загружен снимок данных из {snapshot_dir}")
+            return
         
-        try:
-            self.movie_titles = pd.read_csv(
-                movies_path, 
-                sep='|', 
-                encoding='latin-1',
-                header=None,
-                usecols=[0, 1],
-                names=['movie_id', 'title']
+        with metrics.span("ratings_read"):
+            ratings_df = await asyncio.to_thread(
+                read_ratings, dataset_path, layout_name, self.config["load_chunk_size"]
             )
-            print(f"Загружено {len(self.movie_titles)} названий фильмов")
+        print(f"Загружено {len(ratings_df)} оценок ({layout_name})")
+        
+        try:
+            with metrics.span("catalog_read"):
+                movie_catalog = read_movies(movies_path, layout_name)
+            print(f"Загружено {len(movie_catalog)} названий фильмов")
         except Exception as e:
             print(f"Ошибка загрузки названий фильмов: {e}")
-            self.movie_titles = pd.DataFrame(columns=['movie_id', 'title'])
+            movie_catalog = MovieCatalog.empty()
+        
+        await self.load_ratings(ratings_df, movie_catalog)
+        
+        if snapshot_dir:
+            try:
+                with metrics.span("snapshot_save"):
+                    save_snapshot(self, snapshot_dir, source_paths)
+            except OSError as e:
+                print(f"Ошибка сохранения снимка данных: {e}")
+    
+    async def load_ratings(self, ratings_df: pd.DataFrame, movie_catalog: MovieCatalog = None) -> None:
+        """
+        Загрузка готовой таблицы оценок, например синтетической или части датасета
+        
+        :param ratings_df: DataFrame с колонками user_id, movie_id, rating, timestamp
+        :param movie_catalog: каталог фильмов, по умолчанию пустой
+        """
+        self.ratings_df = ratings_df
+        self.movie_catalog = movie_catalog if movie_catalog is not None else MovieCatalog.empty()
+        self.pending_ratings = []
+        self.data_version += 1
+        with metrics.span("store_build"):
+            await self._create_rating_store()
+        self.movie_catalog.set_popularity(self.rating_store.movie_ids, self.rating_store.movie_counts())
+        metrics.set("loaded_ratings", self.rating_store.nnz)
+    
+    async def _create_rating_store(self) -> None:
+        """Создание разреженного хранилища оценок пользователь × фильм в отдельном потоке"""
+        self.rating_store = await asyncio.to_thread(RatingStore, self.ratings_df)
+    
+    async def add_ratings(self, ratings: list) -> int:
+        """
+        Добавить или изменить оценки без перестроения хранилища
         
-        await self._create_user_item_table()
+        Оценки попадают в буфер изменений хранилища и сразу видны движкам.
+        Когда буфер превышает порог compact_threshold, выполняется слияние.
+        
+        :param ratings: список кортежей (user_id, movie_id, rating)
+        :return: количество новых пар пользователь–фильм
+        """
+        async with self._write_lock:
+            return await self._apply_ratings(ratings)
+    
+    async def _apply_ratings(self, ratings: list) -> int:
+        """
+        Запись оценок в буфер изменений, вызывается под _write_lock
+        
+        :param ratings: список кортежей (user_id, movie_id, rating)
+        :return: количество новых пар пользователь–фильм
+        """
+        store = self.rating_store
+        timestamp = int(time.time())
+        new_pairs = 0
+        for user_id, movie_id, rating in ratings:
+            if store.set_rating(user_id, movie_id, rating):
+                new_pairs += 1
+            self.pending_ratings.append((user_id, movie_id, rating, timestamp))
+        
+        if store.delta_size >= self.config["compact_threshold"]:
+            await asyncio.to_thread(self._compact)
+        return new_pairs
+    
+    async def add_user(self, user_ratings: dict) -> int:
+        """
+        Записать оценки нового пользователя, например ранжирование из бота
+        
+        :param user_ratings: словарь {movie_id: rating}
+        :return: ID нового пользователя
+        """
+        async with self._write_lock:
+            user_id = int(self.rating_store.user_ids.max()) + 1 if self.rating_store.n_users else 1
+            await self._apply_ratings([(user_id, movie_id, rating) for movie_id, rating in user_ratings.items()])
+        return user_id
+    
+    async def compact(self) -> None:
+        """Слияние буфера изменений с основным хранилищем"""
+        async with self._write_lock:
+            await asyncio.to_thread(self._compact)
     
-    async def _create_user_item_table(self) -> None:
-        """Создание таблицы пользователь × фильм"""
-        self.user_item_table = self.ratings_df.pivot(
-            index='user_id', 
-            columns='movie_id', 
-            values='rating'
-        ).fillna(0)
+    def _compact(self) -> None:
+        """Слияние буфера изменений, обновление ratings_df и производных индексов"""
+        with metrics.span("compact"):
+            self.rating_store.compact()
+            if self.pending_ratings:
+                pending = pd.DataFrame(self.pending_ratings, columns=self.ratings_df.columns).astype(
+                    self.ratings_df.dtypes.to_dict()
+                )
+                self.ratings_df = pd.concat([self.ratings_df, pending], ignore_index=True).drop_duplicates(
+                    subset=['user_id', 'movie_id'], keep='last'
+                ).reset_index(drop=True)
+                self.pending_ratings = []
+            self.movie_catalog.set_popularity(self.rating_store.movie_ids, self.rating_store.movie_counts())
+        self.data_version += 1
+        metrics.set("loaded_ratings", self.rating_store.nnz)
+        print(f"Буфер оценок слит с хранилищем: {self.rating_store.nnz} оценок")
     
     def get_user_ratings(self, user_id: int) -> dict:
         """
@@ -53,10 +153,8 @@ class DataProcessor:
         :param user_id: ID пользователя
         :return: словарь {movie_id: rating} с ненулевыми оценками
         """
-        if user_id in self.user_item_table.index:
-            user_ratings = self.user_item_table.loc[user_id]
-            return {movie_id: rating for movie_id, rating in user_ratings.items() if rating > 0}
-        return {}
+        movie_ids, ratings = self.rating_store.user_row(user_id)
+        return dict(zip(movie_ids.tolist(), ratings.tolist()))
     
     def get_all_users(self) -> list:
         """
@@ -64,7 +162,7 @@ class DataProcessor:
         
         :return: список ID пользователей
         """
-        return self.user_item_table.index.tolist()
+        return self.rating_store.user_ids.tolist()
     
     def get_movie_title(self, movie_id: int) -> str:
         """
@@ -73,7 +171,6 @@ class DataProcessor:
         :param movie_id: ID фильма
         :return: название фильма
         """
-        if self.movie_titles is not None and not self.movie_titles.empty:
-            title_row = self.movie_titles[self.movie_titles['movie_id'] == movie_id]
-            return title_row['title'].iloc[0] if not title_row.empty else f"Фильм {movie_id}"
+        if self.movie_catalog is not None:
+            return self.movie_catalog.get_title(movie_id)
         return f"Фильм {movie_id}"
@@ -0,0 +1,123 @@
+import os
+import numpy as np
+import pandas as pd
+from movie_catalog import MovieCatalog
+
+RATING_COLUMNS = ['user_id', 'movie_id', 'rating', 'timestamp']
+
+RATING_DTYPES = {
+    'user_id': np.int32,
+    'movie_id': np.int32,
+    'rating': np.float16,
+    'timestamp': np.uint32
+}
+
+LAYOUTS = {
+    "ml-100k": {
+        "ratings_file": "u.data",
+        "movies_file": "u.item",
+        "read_options": {"sep": '\t', "header": None, "usecols": [0, 1, 2, 3]}
+    },
+    "ml-1m": {
+        "ratings_file": "ratings.dat",
+        "movies_file": "movies.dat",
+        # Разделитель "::" разбивается по ":" быстрым C-парсером, пустые поля между двоеточиями пропускаются
+        "read_options": {"sep": ':', "header": None, "usecols": [0, 2, 4, 6]}
+    },
+    "ml-csv": {
+        "ratings_file": "ratings.csv",
+        "movies_file": "movies.csv",
+        "read_options": {"sep": ',', "header": 0, "usecols": ['userId', 'movieId', 'rating', 'timestamp']}
+    }
+}
+
+def detect_layout(dataset_path: str, dataset_format: str = "auto") -> str:
+    """
+    Определить формат датасета MovieLens
+
+    :param dataset_path: путь до файла оценок
+    :param dataset_format: ml-100k, ml-1m, ml-csv (ML-20M/ML-25M) или auto — по имени файла
+    :return: ключ LAYOUTS
+    :raises ValueError: если формат не удалось определить
+    """
+    if dataset_format != "auto":
+        if dataset_format not in LAYOUTS:
+            raise ValueError(f"Неизвестный формат датасета: {dataset_format}")
+        return dataset_format
+    file_name = os.path.basename(dataset_path)
+    for name, layout in LAYOUTS.items():
+        if file_name == layout["ratings_file"]:
+            return name
+    if file_name.endswith('.csv'):
+        return "ml-csv"
+    if file_name.endswith('.dat'):
+        return "ml-1m"
+    return "ml-100k"
+
+def movies_path_for(dataset_path: str, layout_name: str) -> str:
+    """
+    Путь до файла фильмов рядом с файлом оценок
+
+    :param dataset_path: путь до файла оценок
+    :param layout_name: ключ LAYOUTS
+    :return: путь до файла фильмов
+    """
+    return os.path.join(os.path.dirname(dataset_path), LAYOUTS[layout_name]["movies_file"])
+
+def read_ratings(dataset_path: str, layout_name: str, chunk_size: int = 1_000_000) -> pd.DataFrame:
+    """
+    Потоковое чтение оценок частями с компактными типами
+
+    Каждая часть сразу приводится к RATING_DTYPES, так что в памяти одновременно
+    находятся только компактные столбцы и одна разбираемая часть. Столбцы склеиваются
+    по одному, поэтому пик памяти превышает итоговый объём не больше чем на один столбец.
+
+    :param dataset_path: путь до файла оценок
+    :param layout_name: ключ LAYOUTS
+    :param chunk_size: количество строк в части
+    :return: DataFrame с колонками user_id, movie_id, rating, timestamp
+    """
+    read_options = LAYOUTS[layout_name]["read_options"]
+    source_columns = read_options["usecols"]
+    chunks = {column: [] for column in RATING_COLUMNS}
+
+    reader = pd.read_csv(
+        dataset_path,
+        engine='c',
+        chunksize=chunk_size,
+        dtype={source: (np.float32 if column == 'rating' else RATING_DTYPES[column])
+               for source, column in zip(source_columns, RATING_COLUMNS)},
+        **read_options
+    )
+    with reader:
+        for chunk in reader:
+            for source, column in zip(source_columns, RATING_COLUMNS):
+                chunks[column].append(chunk[source].to_numpy().astype(RATING_DTYPES[column], copy=False))
+
+    columns = {}
+    for column in RATING_COLUMNS:
+        parts = chunks.pop(column)
+        columns[column] = np.concatenate(parts) if parts else np.empty(0, dtype=RATING_DTYPES[column])
+        del parts
+    return pd.DataFrame(columns, copy=False)
+
+def read_movies(movies_path: str, layout_name: str) -> MovieCatalog:
+    """
+    Загрузка каталога фильмов в формате датасета
+
+    :param movies_path: путь до файла фильмов
+    :param layout_name: ключ LAYOUTS
+    :return: каталог фильмов
+    """
+    if layout_name == "ml-100k":
+        return MovieCatalog.from_file(movies_path)
+    if layout_name == "ml-1m":
+        movies = pd.read_csv(movies_path, sep='::', engine='python', header=None, encoding='latin-1',
+                             names=['movieId', 'title', 'genres'])
+    else:
+        movies = pd.read_csv(movies_path, dtype={'movieId': np.int32, 'title': str, 'genres': str})
+    return MovieCatalog.from_genre_strings(
+        movies['movieId'].to_numpy(),
+        movies['title'].tolist(),
+        movies['genres'].tolist()
+    )
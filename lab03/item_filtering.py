@@ -0,0 +1,166 @@
+import logging
+import numpy as np
+from data_handler import DataProcessor
+from metrics import metrics
+from rating_store import segment_positions
+
+logger = logging.getLogger(__name__)
+
+class ItemBasedFiltering:
+    def __init__(self, data_processor: DataProcessor, num_neighbours: int = 50) -> None:
+        """
+        Инициализация обработчика Item-Based коллаборативной фильтрации
+
+        :param data_processor: обработчик данных для работы с оценками пользователей
+        :param num_neighbours: количество хранимых похожих фильмов для каждого фильма
+        """
+        self.dp = data_processor
+        self.num_neighbours = num_neighbours
+        self.neighbour_cols = None
+        self.neighbour_sims = None
+
+    def build_neighbours(self, block_budget: int = 4_000_000, expansion_budget: int = 5_000_000) -> None:
+        """
+        Предварительный расчёт top-K похожих фильмов по косинусному сходству
+
+        :param block_budget: максимальный размер блока матрицы сходств в элементах
+        :param expansion_budget: максимальное количество пар оценок, разворачиваемых за один блок
+        """
+        store = self.dp.rating_store
+        n_movies = store.n_movies
+        k = min(self.num_neighbours, max(n_movies - 1, 1))
+
+        norms = np.sqrt(np.bincount(store.indices, weights=store.data.astype(np.float64) ** 2, minlength=n_movies))
+        self.neighbour_cols = np.full((n_movies, k), -1, dtype=np.int32)
+        self.neighbour_sims = np.zeros((n_movies, k), dtype=np.float32)
+
+        with metrics.span("item_neighbours_build"):
+            for cols in self._blocks(max(1, block_budget // max(n_movies, 1)), expansion_budget):
+                dots = self._block_dot_products(cols)
+
+                denominators = norms[cols, None] * norms[None, :]
+                similarities = np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators > 0)
+                similarities[np.arange(len(cols)), cols] = 0
+
+                top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+                top_sims = np.take_along_axis(similarities, top, axis=1)
+                order = np.argsort(-top_sims, axis=1, kind='stable')
+                top = np.take_along_axis(top, order, axis=1)
+                top_sims = np.take_along_axis(top_sims, order, axis=1)
+
+                self.neighbour_cols[cols] = np.where(top_sims > 0, top, -1)
+                self.neighbour_sims[cols] = np.where(top_sims > 0, top_sims, 0)
+
+        print(f"Рассчитаны похожие фильмы: {n_movies} фильмов × {k} соседей")
+
+    def _blocks(self, max_block_size: int, expansion_budget: int) -> list:
+        """
+        Разбиение фильмов на блоки с ограничением на объём промежуточных массивов
+
+        Стоимость фильма — сумма длин строк всех оценивших его пользователей,
+        именно столько пар разворачивается при расчёте его скалярных произведений.
+
+        :param max_block_size: максимальное количество фильмов в блоке
+        :param expansion_budget: максимальная суммарная стоимость блока
+        :return: список массивов номеров столбцов
+        """
+        store = self.dp.rating_store
+        n_movies = len(store.col_indptr) - 1
+        user_lengths = np.diff(store.indptr)
+        entry_cols = np.repeat(np.arange(n_movies), np.diff(store.col_indptr))
+        costs = np.bincount(entry_cols, weights=user_lengths[store.col_indices], minlength=n_movies)
+
+        blocks, block_start, block_cost = [], 0, 0.0
+        for col in range(n_movies):
+            if col > block_start and (col - block_start >= max_block_size or block_cost + costs[col] > expansion_budget):
+                blocks.append(np.arange(block_start, col))
+                block_start, block_cost = col, 0.0
+            block_cost += costs[col]
+        blocks.append(np.arange(block_start, n_movies))
+        return blocks
+
+    def _block_dot_products(self, cols: np.ndarray) -> np.ndarray:
+        """
+        Скалярные произведения векторов оценок блока фильмов со всеми фильмами
+
+        :param cols: номера столбцов фильмов блока
+        :return: матрица len(cols) × n_movies
+        """
+        store = self.dp.rating_store
+        starts = store.col_indptr[cols]
+        lengths = store.col_indptr[cols + 1] - starts
+        entries = segment_positions(starts, lengths)
+        local_cols = np.repeat(np.arange(len(cols)), lengths)
+        users = store.col_indices[entries]
+        block_ratings = store.col_data[entries].astype(np.float64)
+
+        user_starts = store.indptr[users]
+        user_lengths = store.indptr[users + 1] - user_starts
+        nonzero = segment_positions(user_starts, user_lengths)
+        positions = np.repeat(local_cols, user_lengths).astype(np.int64) * store.n_movies + store.indices[nonzero]
+        weights = np.repeat(block_ratings, user_lengths) * store.data[nonzero]
+
+        dots = np.bincount(positions, weights=weights, minlength=len(cols) * store.n_movies)
+        return dots.reshape(len(cols), store.n_movies)
+
+    async def generate_recommendations(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Генерация рекомендаций на основе оценок виртуального пользователя
+        используя Item-Based Collaborative Filtering
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество возвращаемых рекомендаций
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        """
+        return self.recommend(virtual_user_ratings, num_recommendations)
+
+    def recommend(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Синхронный расчёт рекомендаций Item-Based Collaborative Filtering
+
+        :param virtual_user_ratings: словарь оценок пользователя
+        :param num_recommendations: количество возвращаемых рекомендаций
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        """
+        if self.neighbour_cols is None:
+            self.build_neighbours()
+
+        metrics.inc("recommendation_requests_total", engine="item")
+        store = self.dp.rating_store
+        n_movies = len(self.neighbour_cols)
+        rated = [(store.movie_index[movie_id], rating) for movie_id, rating in virtual_user_ratings.items()
+                 if movie_id in store.movie_index and store.movie_index[movie_id] < n_movies]
+        if not rated:
+            logger.debug("Нет оценённых фильмов из датасета")
+            metrics.inc("empty_recommendations_total", engine="item")
+            return []
+
+        with metrics.span("aggregation", engine="item"):
+            rated_cols = np.array([col for col, _ in rated])
+            rated_scores = np.array([rating for _, rating in rated], dtype=np.float64)
+
+            neighbour_cols = self.neighbour_cols[rated_cols]
+            neighbour_sims = self.neighbour_sims[rated_cols].astype(np.float64)
+            valid = neighbour_cols >= 0
+            cols = neighbour_cols[valid]
+            sims = neighbour_sims[valid]
+            scores = np.broadcast_to(rated_scores[:, None], neighbour_cols.shape)[valid]
+
+            total_weighted_score = np.bincount(cols, weights=sims * scores, minlength=n_movies)
+            total_similarity = np.bincount(cols, weights=sims, minlength=n_movies)
+            support = np.bincount(cols, minlength=n_movies)
+            support[rated_cols] = 0
+
+            min_support = 2 if (support >= 2).any() else 1
+            predicted_cols = np.flatnonzero((support >= min_support) & (total_similarity > 0))
+            predicted = np.clip(total_weighted_score[predicted_cols] / total_similarity[predicted_cols], 1.0, 5.0)
+
+        metrics.inc("predicted_movies_total", len(predicted_cols), engine="item")
+        logger.debug("Рассчитано рейтингов: %d", len(predicted_cols))
+
+        with metrics.span("ranking", engine="item"):
+            order = np.lexsort((predicted_cols, -total_similarity[predicted_cols], -predicted))[:num_recommendations]
+            return list(zip(
+                store.movie_ids[predicted_cols[order]].tolist(),
+                predicted[order].tolist()
+            ))
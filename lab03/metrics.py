@@ -0,0 +1,183 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+METRIC_HELP = {
+    "stage_seconds": "Длительность этапов расчёта рекомендаций и загрузки данных",
+    "recommendation_requests_total": "Количество запросов к движку рекомендаций",
+    "candidate_users_total": "Суммарное количество пользователей-кандидатов",
+    "neighbour_users_total": "Суммарное количество выбранных соседей",
+    "predicted_movies_total": "Суммарное количество фильмов с предсказанным рейтингом",
+    "empty_recommendations_total": "Количество запросов без рекомендаций",
+    "loaded_ratings": "Количество оценок в хранилище",
+    "recommendation_cache_total": "Обращения к кэшу рекомендаций по результату",
+    "executor_pending": "Запросы в пуле расчёта рекомендаций",
+    "session_evictions_total": "Вытесненные сессии пользователей по причине",
+    "sessions": "Количество активных сессий пользователей"
+}
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "recsys", buckets: tuple = DEFAULT_BUCKETS) -> None:
+        """
+        Реестр счётчиков, значений и гистограмм длительностей в формате Prometheus
+
+        :param prefix: префикс имён метрик
+        :param buckets: верхние границы корзин гистограмм в секундах
+        """
+        self.prefix = prefix
+        self.buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Увеличить счётчик
+
+        :param name: имя метрики без префикса
+        :param value: приращение
+        :param labels: метки
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """
+        Установить текущее значение
+
+        :param name: имя метрики без префикса
+        :param value: значение
+        :param labels: метки
+        """
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Добавить наблюдение в гистограмму
+
+        :param name: имя метрики без префикса
+        :param value: наблюдаемое значение
+        :param labels: метки
+        """
+        key = (name, tuple(sorted(labels.items())))
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            if bucket < len(self.buckets):
+                histogram[0][bucket] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """
+        Замер длительности блока кода в гистограмму stage_seconds
+
+        :param stage: название этапа
+        :param labels: дополнительные метки
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+        """
+        Метки в синтаксисе Prometheus
+
+        :param labels: кортеж пар (имя, значение)
+        :param extra: дополнительные пары, добавляемые в конец
+        :return: строка вида {a="1",b="2"} или пустая строка
+        """
+        pairs = labels + extra
+        if not pairs:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> str:
+        """
+        Текстовый формат экспозиции Prometheus
+
+        :return: содержимое для /metrics
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (list(value[0]), value[1], value[2]) for key, value in self._histograms.items()}
+
+        lines = []
+        for kind, series in (("counter", counters), ("gauge", gauges), ("histogram", histograms)):
+            for name in sorted({name for name, _ in series}):
+                full_name = f"{self.prefix}_{name}"
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {full_name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name != name:
+                        continue
+                    if kind != "histogram":
+                        lines.append(f"{full_name}{self._format_labels(labels)} {value}")
+                        continue
+                    bucket_counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets, bucket_counts):
+                        cumulative += bucket_count
+                        lines.append(f"{full_name}_bucket{self._format_labels(labels, (('le', bound),))} {cumulative}")
+                    lines.append(f"{full_name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {count}")
+                    lines.append(f"{full_name}_sum{self._format_labels(labels)} {total}")
+                    lines.append(f"{full_name}_count{self._format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """
+        Записать метрики в файл атомарно, например для textfile-коллектора node_exporter
+
+        :param path: путь к .prom файлу
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def reset(self) -> None:
+        """Очистить все метрики"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+metrics = MetricsRegistry()
+
+async def start_metrics_server(registry: MetricsRegistry, host: str, port: int):
+    """
+    Запустить HTTP-эндпоинт /metrics
+
+    :param registry: реестр метрик
+    :param host: адрес для прослушивания
+    :param port: порт
+    :return: AppRunner, который нужно остановить через cleanup()
+    """
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode('utf-8'), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
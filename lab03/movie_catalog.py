@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+GENRES = [
+    "unknown", "Action", "Adventure", "Animation", "Children's", "Comedy",
+    "Crime", "Documentary", "Drama", "Fantasy", "Film-Noir", "Horror",
+    "Musical", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western"
+]
+
+class MovieCatalog:
+    def __init__(self, movie_ids: np.ndarray, titles: list, genre_flags: np.ndarray) -> None:
+        """
+        Каталог фильмов с индексом названий, жанров и популярности
+
+        :param movie_ids: массив ID фильмов
+        :param titles: названия фильмов в том же порядке
+        :param genre_flags: матрица фильм × жанр из 0 и 1
+        """
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int32)
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(self.movie_ids.tolist())}
+        self.titles = list(titles)
+        self.genre_bits = np.packbits(np.asarray(genre_flags, dtype=bool), axis=1)
+        self.popular_movie_ids = np.empty(0, dtype=np.int32)
+
+    @classmethod
+    def from_file(cls, movies_path: str) -> "MovieCatalog":
+        """
+        Загрузка каталога из файла u.item
+
+        :param movies_path: путь до файла с описанием фильмов
+        :return: каталог фильмов
+        """
+        movies = pd.read_csv(
+            movies_path,
+            sep='|',
+            encoding='latin-1',
+            header=None,
+            usecols=[0, 1] + list(range(5, 5 + len(GENRES))),
+        )
+        return cls(
+            movies[0].to_numpy(),
+            movies[1].tolist(),
+            movies.iloc[:, 2:].to_numpy()
+        )
+
+    @classmethod
+    def from_genre_strings(cls, movie_ids: np.ndarray, titles: list, genres: list) -> "MovieCatalog":
+        """
+        Создание каталога по жанрам в виде строк "Action|Comedy" (ML-1M, ML-20M, ML-25M)
+
+        Жанры, которых нет в GENRES (например, IMAX), пропускаются.
+
+        :param movie_ids: массив ID фильмов
+        :param titles: названия фильмов
+        :param genres: строки жанров через "|"
+        :return: каталог фильмов
+        """
+        genre_index = {genre: i for i, genre in enumerate(GENRES)}
+        genre_index["Children"] = genre_index["Children's"]
+        genre_index["(no genres listed)"] = genre_index["unknown"]
+        genre_flags = np.zeros((len(titles), len(GENRES)), dtype=bool)
+        for i, movie_genres in enumerate(genres):
+            for genre in str(movie_genres).split('|'):
+                if genre in genre_index:
+                    genre_flags[i, genre_index[genre]] = True
+        return cls(movie_ids, titles, genre_flags)
+
+    @classmethod
+    def from_arrays(cls, movie_ids: np.ndarray, titles: list, genre_bits: np.ndarray,
+                    popular_movie_ids: np.ndarray) -> "MovieCatalog":
+        """
+        Восстановление каталога из готовых массивов
+
+        :param movie_ids: массив ID фильмов
+        :param titles: названия фильмов
+        :param genre_bits: упакованные флаги жанров
+        :param popular_movie_ids: ID фильмов по убыванию популярности
+        :return: каталог фильмов
+        """
+        catalog = cls(movie_ids, titles, np.empty((0, len(GENRES)), dtype=bool))
+        catalog.genre_bits = genre_bits
+        catalog.popular_movie_ids = popular_movie_ids
+        return catalog
+
+    @classmethod
+    def empty(cls) -> "MovieCatalog":
+        """Пустой каталог на случай ошибки загрузки"""
+        return cls(np.empty(0, dtype=np.int32), [], np.empty((0, len(GENRES)), dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def set_popularity(self, movie_ids: np.ndarray, rating_counts: np.ndarray) -> None:
+        """
+        Сохранить рейтинг популярности фильмов по количеству оценок
+
+        :param movie_ids: массив ID фильмов по возрастанию
+        :param rating_counts: количество оценок каждого фильма
+        """
+        order = np.argsort(-np.asarray(rating_counts), kind='stable')
+        self.popular_movie_ids = np.asarray(movie_ids, dtype=np.int32)[order]
+
+    def get_popular_movies(self, count: int) -> list:
+        """
+        Получить самые популярные фильмы
+
+        :param count: количество фильмов
+        :return: список ID фильмов по убыванию количества оценок
+        """
+        return self.popular_movie_ids[:count].tolist()
+
+    def get_title(self, movie_id: int) -> str:
+        """
+        Получить название фильма по ID
+
+        :param movie_id: ID фильма
+        :return: название фильма
+        """
+        i = self.movie_index.get(movie_id)
+        return self.titles[i] if i is not None else f"Фильм {movie_id}"
+
+    def get_genres(self, movie_id: int) -> list:
+        """
+        Получить жанры фильма
+
+        :param movie_id: ID фильма
+        :return: список названий жанров
+        """
+        i = self.movie_index.get(movie_id)
+        if i is None:
+            return []
+        flags = np.unpackbits(self.genre_bits[i], count=len(GENRES))
+        return [genre for genre, flag in zip(GENRES, flags) if flag]
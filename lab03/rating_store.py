@@ -0,0 +1,308 @@
+import threading
+import numpy as np
+import pandas as pd
+
+def segment_positions(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Позиции всех элементов набора непрерывных отрезков массива
+
+    :param starts: начала отрезков
+    :param lengths: длины отрезков
+    :return: склеенные позиции элементов отрезков по порядку
+    """
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets
+
+class RatingStore:
+    def __init__(self, ratings_df: pd.DataFrame) -> None:
+        """
+        Разреженное хранилище оценок: CSR по пользователям и CSC по фильмам
+
+        :param ratings_df: DataFrame с колонками user_id, movie_id, rating
+        """
+        user_col = ratings_df['user_id'].to_numpy()
+        movie_col = ratings_df['movie_id'].to_numpy()
+        rating_col = ratings_df['rating'].to_numpy(dtype=np.float32)
+
+        self.user_ids = np.unique(user_col).astype(np.int32)
+        self.movie_ids = np.unique(movie_col).astype(np.int32)
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+        self.movie_index = {movie_id: col for col, movie_id in enumerate(self.movie_ids.tolist())}
+
+        rows = np.searchsorted(self.user_ids, user_col).astype(np.int32)
+        cols = np.searchsorted(self.movie_ids, movie_col).astype(np.int32)
+        self._set_base(rows, cols, rating_col)
+        self._init_delta()
+
+    def _set_base(self, rows: np.ndarray, cols: np.ndarray, ratings: np.ndarray) -> None:
+        """
+        Построение основных массивов CSR и CSC по тройкам (строка, столбец, оценка)
+
+        :param rows: номера строк пользователей
+        :param cols: номера столбцов фильмов
+        :param ratings: оценки
+        """
+        order = np.lexsort((cols, rows))
+        self.indptr = self._build_indptr(rows, self.n_users)
+        self.indices = cols[order]
+        self.data = ratings[order]
+
+        order = np.lexsort((rows, cols))
+        self.col_indptr = self._build_indptr(cols, self.n_movies)
+        self.col_indices = rows[order]
+        self.col_data = ratings[order]
+
+    def _init_delta(self) -> None:
+        """Пустой буфер добавленных и изменённых оценок поверх основных массивов"""
+        self.delta_rows = {}
+        self.delta_cols = {}
+        self.delta_new = 0
+        self._lock = threading.RLock()
+
+    ARRAYS = ('user_ids', 'movie_ids', 'indptr', 'indices', 'data', 'col_indptr', 'col_indices', 'col_data')
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "RatingStore":
+        """
+        Восстановление хранилища из готовых массивов (например, отображённых в память)
+
+        :param arrays: словарь массивов с ключами из RatingStore.ARRAYS
+        :return: хранилище оценок
+        """
+        store = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(store, name, arrays[name])
+        store.user_index = {user_id: row for row, user_id in enumerate(store.user_ids.tolist())}
+        store.movie_index = {movie_id: col for col, movie_id in enumerate(store.movie_ids.tolist())}
+        store._init_delta()
+        return store
+
+    @staticmethod
+    def _build_indptr(positions: np.ndarray, size: int) -> np.ndarray:
+        """
+        Построение массива смещений строк (столбцов) по номерам позиций
+
+        :param positions: номер строки (столбца) для каждой оценки
+        :param size: количество строк (столбцов)
+        :return: массив смещений длины size + 1
+        """
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(positions, minlength=size), out=indptr[1:])
+        return indptr
+
+    @property
+    def n_users(self) -> int:
+        """Количество пользователей"""
+        return len(self.user_ids)
+
+    @property
+    def n_movies(self) -> int:
+        """Количество фильмов"""
+        return len(self.movie_ids)
+
+    @property
+    def nnz(self) -> int:
+        """Количество хранимых оценок"""
+        return len(self.data) + self.delta_new
+
+    @property
+    def delta_size(self) -> int:
+        """Количество оценок в буфере изменений"""
+        return sum(len(cols) for cols in self.delta_rows.values())
+
+    def _base_value(self, row: int, col: int) -> float:
+        """
+        Оценка из основных массивов
+
+        :param row: номер строки пользователя
+        :param col: номер столбца фильма
+        :return: оценка или None, если её нет
+        """
+        if row >= len(self.indptr) - 1:
+            return None
+        start, end = self.indptr[row], self.indptr[row + 1]
+        position = start + np.searchsorted(self.indices[start:end], col)
+        if position < end and self.indices[position] == col:
+            return float(self.data[position])
+        return None
+
+    def add_user(self, user_id: int) -> int:
+        """
+        Добавить пользователя без оценок, если его ещё нет
+
+        :param user_id: ID пользователя
+        :return: номер строки пользователя
+        """
+        with self._lock:
+            row = self.user_index.get(user_id)
+            if row is None:
+                row = self.n_users
+                self.user_ids = np.append(self.user_ids, np.int32(user_id))
+                self.user_index[user_id] = row
+            return row
+
+    def add_movie(self, movie_id: int) -> int:
+        """
+        Добавить фильм без оценок, если его ещё нет
+
+        :param movie_id: ID фильма
+        :return: номер столбца фильма
+        """
+        with self._lock:
+            col = self.movie_index.get(movie_id)
+            if col is None:
+                col = self.n_movies
+                self.movie_ids = np.append(self.movie_ids, np.int32(movie_id))
+                self.movie_index[movie_id] = col
+            return col
+
+    def set_rating(self, user_id: int, movie_id: int, rating: float) -> bool:
+        """
+        Добавить или изменить оценку через буфер изменений
+
+        :param user_id: ID пользователя
+        :param movie_id: ID фильма
+        :param rating: оценка
+        :return: True, если это новая пара пользователь–фильм
+        """
+        with self._lock:
+            row = self.add_user(user_id)
+            col = self.add_movie(movie_id)
+            is_new = col not in self.delta_rows.get(row, {}) and self._base_value(row, col) is None
+            self.delta_rows.setdefault(row, {})[col] = float(rating)
+            self.delta_cols.setdefault(col, {})[row] = float(rating)
+            if is_new:
+                self.delta_new += 1
+            return is_new
+
+    def compact(self) -> None:
+        """
+        Слияние буфера изменений с основными массивами
+
+        Номера строк и столбцов сохраняются, поэтому построенные по ним индексы остаются верными.
+        """
+        with self._lock:
+            if not self.delta_rows:
+                return
+            rows, cols, ratings = self.gather_rows(np.arange(self.n_users))
+            self._set_base(rows.astype(np.int32), cols.astype(np.int32), ratings.astype(np.float32))
+            self.delta_rows = {}
+            self.delta_cols = {}
+            self.delta_new = 0
+
+    def user_counts(self) -> np.ndarray:
+        """Количество оценок каждого пользователя по строкам"""
+        with self._lock:
+            counts = np.zeros(self.n_users, dtype=np.int64)
+            counts[:len(self.indptr) - 1] = np.diff(self.indptr)
+            for row, cols in self.delta_rows.items():
+                counts[row] += sum(1 for col in cols if self._base_value(row, col) is None)
+            return counts
+
+    def movie_counts(self) -> np.ndarray:
+        """Количество оценок каждого фильма по столбцам"""
+        with self._lock:
+            counts = np.zeros(self.n_movies, dtype=np.int64)
+            counts[:len(self.col_indptr) - 1] = np.diff(self.col_indptr)
+            for col, rows in self.delta_cols.items():
+                counts[col] += sum(1 for row in rows if self._base_value(row, col) is None)
+            return counts
+
+    def column_entries(self, col: int) -> tuple:
+        """
+        Оценки фильма с учётом буфера изменений
+
+        :param col: номер столбца фильма
+        :return: кортеж (массив строк пользователей, массив оценок)
+        """
+        with self._lock:
+            if col < len(self.col_indptr) - 1:
+                start, end = self.col_indptr[col], self.col_indptr[col + 1]
+                rows, ratings = self.col_indices[start:end], self.col_data[start:end]
+            else:
+                rows, ratings = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+            delta = self.delta_cols.get(col)
+            if not delta:
+                return rows, ratings
+            delta_rows = np.fromiter(delta.keys(), dtype=np.int32, count=len(delta))
+            delta_ratings = np.fromiter(delta.values(), dtype=np.float32, count=len(delta))
+            keep = ~np.isin(rows, delta_rows)
+            return np.concatenate([rows[keep], delta_rows]), np.concatenate([ratings[keep], delta_ratings])
+
+    def gather_rows(self, rows: np.ndarray) -> tuple:
+        """
+        Все оценки нескольких пользователей с учётом буфера изменений
+
+        :param rows: номера строк пользователей
+        :return: кортеж (позиция строки в rows, номер столбца, оценка) для каждой оценки
+        """
+        with self._lock:
+            rows = np.asarray(rows, dtype=np.int64)
+            in_base = np.flatnonzero(rows < len(self.indptr) - 1)
+            starts = self.indptr[rows[in_base]]
+            lengths = self.indptr[rows[in_base] + 1] - starts
+            positions = segment_positions(starts, lengths)
+            owners = np.repeat(in_base, lengths)
+            cols = self.indices[positions].astype(np.int64)
+            ratings = self.data[positions]
+
+            if not self.delta_rows:
+                return owners, cols, ratings
+
+            delta_owners, delta_cols, delta_ratings = [], [], []
+            for i in np.flatnonzero(np.isin(rows, np.fromiter(self.delta_rows, dtype=np.int64))):
+                for col, rating in self.delta_rows[int(rows[i])].items():
+                    delta_owners.append(i)
+                    delta_cols.append(col)
+                    delta_ratings.append(rating)
+            if not delta_owners:
+                return owners, cols, ratings
+
+            delta_owners = np.array(delta_owners, dtype=np.int64)
+            delta_cols = np.array(delta_cols, dtype=np.int64)
+            keep = ~np.isin(owners * self.n_movies + cols, delta_owners * self.n_movies + delta_cols)
+            return (
+                np.concatenate([owners[keep], delta_owners]),
+                np.concatenate([cols[keep], delta_cols]),
+                np.concatenate([ratings[keep], np.array(delta_ratings, dtype=np.float32)])
+            )
+
+    def user_row(self, user_id: int) -> tuple:
+        """
+        Получить ненулевые оценки пользователя
+
+        :param user_id: ID пользователя
+        :return: кортеж (массив ID фильмов, массив оценок)
+        """
+        row = self.user_index.get(user_id)
+        if row is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        _, cols, ratings = self.gather_rows([row])
+        order = np.argsort(cols, kind='stable')
+        return self.movie_ids[cols[order]], ratings[order]
+
+    def dense_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Развернуть несколько строк CSR в плотную матрицу
+
+        :param rows: номера строк хранилища
+        :return: матрица len(rows) × n_movies с нулями на месте отсутствующих оценок
+        """
+        row_positions, cols, ratings = self.gather_rows(rows)
+        dense = np.zeros((len(rows), self.n_movies))
+        dense[row_positions, cols] = ratings
+        return dense
+
+    def movie_column(self, movie_id: int) -> tuple:
+        """
+        Получить ненулевые оценки фильма
+
+        :param movie_id: ID фильма
+        :return: кортеж (массив ID пользователей, массив оценок)
+        """
+        col = self.movie_index.get(movie_id)
+        if col is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        rows, ratings = self.column_entries(col)
+        return self.user_ids[rows], ratings
@@ -0,0 +1,161 @@
+import random
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class RecommendationCache:
+    def __init__(self, engine, max_size: int = 4096) -> None:
+        """
+        LRU-кэш результатов рекомендаций перед движком
+
+        :param engine: движок рекомендаций с синхронным методом recommend и атрибутом dp
+        :param max_size: максимальное количество хранимых результатов
+        """
+        self.engine = engine
+        self.max_size = max_size
+        self.version = engine.dp.data_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(virtual_user_ratings: dict, num_recommendations: int) -> tuple:
+        """
+        Канонический ключ: порядок фильмов в словаре и типы чисел не важны
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество рекомендаций
+        :return: хешируемый ключ
+        """
+        ratings = tuple(sorted((int(movie_id), float(rating)) for movie_id, rating in virtual_user_ratings.items()))
+        return num_recommendations, ratings
+
+    def _check_version(self) -> None:
+        """Сброс кэша, если версия датасета изменилась"""
+        version = self.engine.dp.data_version
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+            self.invalidations += 1
+
+    def lookup(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Найти готовый результат
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество рекомендаций
+        :return: список рекомендаций или None при промахе
+        """
+        key = self.make_key(virtual_user_ratings, num_recommendations)
+        with self._lock:
+            self._check_version()
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(result)
+
+    def store(self, virtual_user_ratings: dict, num_recommendations: int, result: list,
+              version: int = None) -> None:
+        """
+        Сохранить результат
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество рекомендаций
+        :param result: список рекомендаций
+        :param version: версия датасета, на которой посчитан результат
+        """
+        key = self.make_key(virtual_user_ratings, num_recommendations)
+        with self._lock:
+            self._check_version()
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = tuple(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def recommend(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Рекомендации из кэша или от движка с сохранением результата
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество рекомендаций
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        """
+        result = self.lookup(virtual_user_ratings, num_recommendations)
+        if result is None:
+            version = self.engine.dp.data_version
+            result = self.engine.recommend(virtual_user_ratings, num_recommendations)
+            self.store(virtual_user_ratings, num_recommendations, result, version)
+        return result
+
+    async def generate_recommendations(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Асинхронный интерфейс, совместимый с движками
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество рекомендаций
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        """
+        return self.recommend(virtual_user_ratings, num_recommendations)
+
+    def warm_up(self, movie_pool: list, rating_scores: list, limit: int, seed: int = 0) -> int:
+        """
+        Заполнить кэш вероятными запросами бота
+
+        Наборы фильмов выбираются из пула так же, как в боте, а порядок внутри набора
+        берётся по средней оценке фильмов — так фильмы чаще всего и ранжируют.
+
+        :param movie_pool: фильмы, из которых бот предлагает выбор
+        :param rating_scores: оценки по позициям ранжирования
+        :param limit: количество запросов для прогрева
+        :param seed: зерно генератора наборов
+        :return: количество посчитанных запросов
+        """
+        store = self.engine.dp.rating_store
+        rating_sums = np.bincount(store.indices, weights=store.data, minlength=store.n_movies)
+        rating_counts = np.diff(store.col_indptr)
+        mean_ratings = rating_sums[:len(rating_counts)] / np.maximum(rating_counts, 1)
+
+        def mean_rating(movie_id: int) -> float:
+            col = store.movie_index.get(movie_id)
+            return mean_ratings[col] if col is not None and col < len(mean_ratings) else 0.0
+
+        rnd = random.Random(seed)
+        computed = 0
+        for _ in range(limit):
+            movies = sorted(rnd.sample(movie_pool, len(rating_scores)), key=mean_rating, reverse=True)
+            virtual_user_ratings = dict(zip(movies, rating_scores))
+            with self._lock:
+                cached = self.make_key(virtual_user_ratings, 5) in self._entries
+            if not cached:
+                version = self.engine.dp.data_version
+                result = self.engine.recommend(virtual_user_ratings, 5)
+                self.store(virtual_user_ratings, 5, result, version)
+                computed += 1
+        return computed
+
+    def stats(self) -> dict:
+        """
+        Статистика кэша
+
+        :return: словарь с попаданиями, промахами, вытеснениями и размером
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_size": self.max_size
+            }
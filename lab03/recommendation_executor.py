@@ -0,0 +1,92 @@
+import asyncio
+import multiprocessing as mp
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+_worker_engine = None
+
+class ExecutorOverloadedError(RuntimeError):
+    """Очередь запросов на рекомендации переполнена"""
+
+def _recommend_in_worker(virtual_user_ratings: dict, num_recommendations: int) -> list:
+    """
+    Расчёт рекомендаций в процессе-воркере движком, унаследованным через fork
+
+    :param virtual_user_ratings: словарь виртуального пользователя
+    :param num_recommendations: количество рекомендаций
+    :return: список кортежей c id фильмов и предсказанными рейтингами
+    """
+    return _worker_engine.recommend(virtual_user_ratings, num_recommendations)
+
+def _warm_up() -> None:
+    """Пустая задача для запуска воркеров заранее"""
+
+class RecommendationExecutor:
+    def __init__(self, engine, mode: str = "thread", max_workers: int = 2,
+                 max_queue: int = 32, timeout: float = 10.0) -> None:
+        """
+        Вынос CPU-нагрузки расчёта рекомендаций из цикла событий бота
+
+        :param engine: движок рекомендаций с синхронным методом recommend
+        :param mode: "thread" для пула потоков или "process" для пула процессов
+        :param max_workers: количество воркеров
+        :param max_queue: сколько запросов может ждать сверх занятых воркеров
+        :param timeout: максимальное время ожидания результата в секундах
+        """
+        if mode not in ("thread", "process"):
+            raise ValueError("Неверный mode: thread или process")
+        self.engine = engine
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self._pool: Executor = None
+        self._loop = None
+
+    async def start(self) -> None:
+        """
+        Создание пула после загрузки данных
+
+        Процессы создаются через fork и наследуют загруженные данные без копирования,
+        поэтому пул нужно запускать после load_data.
+        """
+        global _worker_engine
+        self._loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            _worker_engine = self.engine
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=mp.get_context("fork"))
+            await asyncio.wrap_future(self._pool.submit(_warm_up))
+        else:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="recommend")
+
+    async def submit(self, virtual_user_ratings: dict, num_recommendations: int = 5) -> list:
+        """
+        Рассчитать рекомендации в пуле и дождаться результата
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_recommendations: количество рекомендаций
+        :return: список кортежей c id фильмов и предсказанными рейтингами
+        :raises ExecutorOverloadedError: если очередь переполнена
+        :raises TimeoutError: если результат не получен за timeout секунд
+        """
+        if self.pending >= self.max_pending:
+            raise ExecutorOverloadedError(f"В очереди уже {self.pending} запросов")
+
+        if self.mode == "process":
+            future = self._pool.submit(_recommend_in_worker, virtual_user_ratings, num_recommendations)
+        else:
+            future = self._pool.submit(self.engine.recommend, virtual_user_ratings, num_recommendations)
+
+        self.pending += 1
+        future.add_done_callback(lambda _: self._loop.call_soon_threadsafe(self._release))
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+    def _release(self) -> None:
+        """Освобождение места в очереди после фактического завершения задачи"""
+        self.pending -= 1
+
+    async def shutdown(self) -> None:
+        """Остановка пула с отменой ещё не начатых задач"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,243 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from metrics import metrics
+
+class Session:
+    __slots__ = ('step', 'movies_to_rank', 'last_seen')
+
+    def __init__(self, step: str, movies_to_rank: list, last_seen: float = 0.0) -> None:
+        """
+        Состояние диалога пользователя с ботом
+
+        :param step: текущий шаг диалога
+        :param movies_to_rank: список кортежей (movie_id, title) для ранжирования
+        :param last_seen: время последнего обращения
+        """
+        self.step = step
+        self.movies_to_rank = movies_to_rank
+        self.last_seen = last_seen
+
+class SessionStore:
+    def __init__(self, max_size: int = 10000, ttl: float = 1800.0) -> None:
+        """
+        Ограниченное хранилище сессий в памяти с вытеснением LRU и по простою
+
+        :param max_size: максимальное количество сессий
+        :param ttl: время простоя в секундах, после которого сессия удаляется
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = {"lru": 0, "ttl": 0}
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evicted(self, reason: str, count: int = 1) -> None:
+        """
+        Учёт вытесненных сессий
+
+        :param reason: lru или ttl
+        :param count: количество сессий
+        """
+        if count:
+            self.evictions[reason] += count
+            metrics.inc("session_evictions_total", count, reason=reason)
+
+    def get(self, user_id: int) -> Session:
+        """
+        Получить сессию пользователя и продлить её
+
+        :param user_id: ID пользователя Telegram
+        :return: сессия или None, если её нет или она истекла
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return None
+            if now - session.last_seen > self.ttl:
+                del self._sessions[user_id]
+                self._evicted("ttl")
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(user_id)
+            return session
+
+    def put(self, user_id: int, session: Session) -> None:
+        """
+        Сохранить сессию пользователя
+
+        :param user_id: ID пользователя Telegram
+        :param session: сессия
+        """
+        session.last_seen = time.monotonic()
+        with self._lock:
+            self._sessions[user_id] = session
+            self._sessions.move_to_end(user_id)
+            evicted = 0
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+                evicted += 1
+            self._evicted("lru", evicted)
+
+    def delete(self, user_id: int) -> None:
+        """
+        Удалить сессию пользователя
+
+        :param user_id: ID пользователя Telegram
+        """
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def purge_expired(self) -> int:
+        """
+        Удалить все сессии, простаивающие дольше ttl
+
+        Сессии упорядочены по последнему обращению, поэтому проверка идёт
+        с начала до первой живой.
+
+        :return: количество удалённых сессий
+        """
+        deadline = time.monotonic() - self.ttl
+        with self._lock:
+            expired = 0
+            while self._sessions:
+                user_id, session = next(iter(self._sessions.items()))
+                if session.last_seen >= deadline:
+                    break
+                del self._sessions[user_id]
+                expired += 1
+            self._evicted("ttl", expired)
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        """
+        Статистика хранилища
+
+        :return: словарь с размером и количеством вытеснений
+        """
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "evicted_lru": self.evictions["lru"],
+            "evicted_ttl": self.evictions["ttl"]
+        }
+
+    def close(self) -> None:
+        """Освободить ресурсы хранилища"""
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path: str, max_size: int = 10000, ttl: float = 1800.0) -> None:
+        """
+        Хранилище сессий в SQLite: переживает перезапуск и разделяется между процессами бота
+
+        Время обращения хранится как unix time, чтобы его понимали все процессы.
+        Методы выполняют запросы к базе синхронно, из бота они вызываются через asyncio.to_thread.
+
+        :param path: путь к файлу базы
+        :param max_size: максимальное количество сессий; лимит проверяется раз в trim_interval записей,
+            поэтому между проверками он может быть превышен не больше чем на trim_interval
+        :param ttl: время простоя в секундах, после которого сессия удаляется
+        """
+        super().__init__(max_size, ttl)
+        self.trim_interval = max(1, min(1000, max_size // 100))
+        self._puts_since_trim = 0
+        self._connection = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id INTEGER PRIMARY KEY, step TEXT NOT NULL, movies_to_rank TEXT NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def get(self, user_id: int) -> Session:
+        """
+        Получить сессию пользователя и продлить её
+
+        :param user_id: ID пользователя Telegram
+        :return: сессия или None, если её нет или она истекла
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT step, movies_to_rank, last_seen FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            step, movies_to_rank, last_seen = row
+            if now - last_seen > self.ttl:
+                self._connection.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+                self._evicted("ttl")
+                return None
+            self._connection.execute("UPDATE sessions SET last_seen = ? WHERE user_id = ?", (now, user_id))
+        return Session(step, [tuple(movie) for movie in json.loads(movies_to_rank)], now)
+
+    def put(self, user_id: int, session: Session) -> None:
+        """
+        Сохранить сессию пользователя
+
+        :param user_id: ID пользователя Telegram
+        :param session: сессия
+        """
+        session.last_seen = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, step, movies_to_rank, last_seen) VALUES (?, ?, ?, ?)",
+                (user_id, session.step, json.dumps(session.movies_to_rank, ensure_ascii=False), session.last_seen)
+            )
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= self.trim_interval:
+                self._trim()
+
+    def _trim(self) -> None:
+        """
+        Удаление самых давно активных сессий сверх max_size
+
+        Вызывается под блокировкой раз в trim_interval записей: подсчёт требует
+        прохода по таблице, а лишние строки удаляются с начала индекса по last_seen.
+        """
+        self._puts_since_trim = 0
+        excess = self._connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_size
+        if excess > 0:
+            evicted = self._connection.execute(
+                "DELETE FROM sessions WHERE user_id IN (SELECT user_id FROM sessions ORDER BY last_seen LIMIT ?)",
+                (excess,)
+            ).rowcount
+            self._evicted("lru", evicted)
+
+    def delete(self, user_id: int) -> None:
+        """
+        Удалить сессию пользователя
+
+        :param user_id: ID пользователя Telegram
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+    def purge_expired(self) -> int:
+        """
+        Удалить все сессии, простаивающие дольше ttl
+
+        :return: количество удалённых сессий
+        """
+        with self._lock:
+            expired = self._connection.execute(
+                "DELETE FROM sessions WHERE last_seen < ?", (time.time() - self.ttl,)
+            ).rowcount
+            self._evicted("ttl", expired)
+        return expired
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self) -> None:
+        """Закрыть соединение с базой"""
+        with self._lock:
+            self._connection.close()
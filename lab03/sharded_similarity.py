@@ -0,0 +1,239 @@
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+from rating_store import segment_positions
+from similarity import _pairs_cosine_similarity, select_top_neighbours
+
+def _attach(spec: dict) -> tuple:
+    """
+    Подключение к блокам разделяемой памяти по их именам
+
+    :param spec: словарь {имя массива: (имя блока, форма, тип)}
+    :return: кортеж (словарь массивов, список блоков)
+    """
+    arrays, blocks = {}, []
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return arrays, blocks
+
+def _shard_neighbours(arrays: dict, shard: int, cols: np.ndarray, ratings: np.ndarray,
+                      exclude_rows: np.ndarray, k: int) -> tuple:
+    """
+    Локальные top-k соседей среди пользователей одного шарда
+
+    Пары общих оценок собираются в том же порядке фильмов, что и в batch_cosine_similarity,
+    поэтому сходства совпадают с однопроцессным расчётом бит в бит.
+
+    :param arrays: массивы разделяемой матрицы
+    :param shard: номер шарда
+    :param cols: столбцы фильмов виртуального пользователя
+    :param ratings: его оценки
+    :param exclude_rows: строки пользователей, исключаемые из соседей
+    :param k: количество соседей
+    :return: кортеж (строки соседей, их сходства) по убыванию сходства
+    """
+    start_row, end_row = arrays["row_bounds"][shard], arrays["row_bounds"][shard + 1]
+    starts = arrays["shard_col_ptr"][shard, cols]
+    lengths = arrays["shard_col_ptr"][shard + 1, cols] - starts
+    positions = segment_positions(starts, lengths)
+
+    similarities, common_counts = _pairs_cosine_similarity(
+        arrays["col_indices"][positions] - start_row,
+        np.repeat(ratings, lengths),
+        arrays["col_data"][positions].astype(np.float64),
+        end_row - start_row,
+        3
+    )
+    eligible = (common_counts >= 3) & (similarities > 0.1)
+    local_excluded = exclude_rows[(exclude_rows >= start_row) & (exclude_rows < end_row)] - start_row
+    eligible[local_excluded] = False
+
+    eligible_rows = np.flatnonzero(eligible)
+    rows, sims = select_top_neighbours(eligible_rows, similarities[eligible_rows], k)
+    return rows + start_row, sims
+
+def _shard_worker(connection, shard: int, spec: dict) -> None:
+    """
+    Цикл процесса-владельца шарда: запросы приходят и уходят через Pipe
+
+    :param connection: конец канала со стороны воркера
+    :param shard: номер шарда
+    :param spec: описание блоков разделяемой памяти
+    """
+    arrays, blocks = _attach(spec)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        kind, payload = message
+        if kind == "attach":
+            arrays = None
+            for block in blocks:
+                block.close()
+            arrays, blocks = _attach(payload)
+            connection.send(True)
+        else:
+            connection.send(_shard_neighbours(arrays, shard, *payload))
+    arrays = None
+    for block in blocks:
+        block.close()
+
+class ShardedUserSimilarity:
+    def __init__(self, data_processor, num_shards: int = 4) -> None:
+        """
+        Поиск соседей, распределённый по процессам-владельцам шардов пользователей
+
+        Матрица оценок в формате CSC один раз копируется в multiprocessing.shared_memory,
+        воркеры подключаются к ней по имени блока. Запрос рассылается всем шардам,
+        каждый возвращает локальный top-k, результаты сливаются в родителе.
+
+        :param data_processor: обработчик данных с загруженным датасетом
+        :param num_shards: количество шардов (процессов)
+        """
+        self.dp = data_processor
+        self.num_shards = num_shards
+        self.version = None
+        self.n_movies = 0
+        self._blocks = []
+        self._workers = []
+        self._connections = []
+        self._owner_pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _publish(self) -> tuple:
+        """
+        Скопировать основные массивы хранилища в новые блоки разделяемой памяти
+
+        Границы шардов подбираются по количеству оценок, а не пользователей,
+        чтобы нагрузка на процессы была равномерной.
+
+        :return: кортеж (описание новых блоков для воркеров, старые блоки)
+        """
+        store = self.dp.rating_store
+        n_users, n_movies = len(store.indptr) - 1, len(store.col_indptr) - 1
+        nnz = store.indptr[-1]
+
+        row_bounds = np.searchsorted(store.indptr, np.linspace(0, nnz, self.num_shards + 1)).astype(np.int64)
+        row_bounds[0], row_bounds[-1] = 0, n_users
+        row_bounds = np.maximum.accumulate(np.minimum(row_bounds, n_users))
+
+        entry_keys = np.repeat(np.arange(n_movies, dtype=np.int64), np.diff(store.col_indptr)) * n_users + store.col_indices
+        shard_col_ptr = np.searchsorted(
+            entry_keys,
+            np.arange(n_movies, dtype=np.int64)[None, :] * n_users + row_bounds[:, None]
+        )
+        del entry_keys
+
+        arrays = {
+            "row_bounds": row_bounds,
+            "shard_col_ptr": shard_col_ptr,
+            "col_indices": np.asarray(store.col_indices),
+            "col_data": np.asarray(store.col_data)
+        }
+        spec, blocks = {}, []
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            blocks.append(block)
+            spec[name] = (block.name, array.shape, array.dtype.str)
+
+        old_blocks, self._blocks = self._blocks, blocks
+        self.n_movies = n_movies
+        self.version = self.dp.data_version
+        return spec, old_blocks
+
+    @staticmethod
+    def _release(blocks: list) -> None:
+        """
+        Освободить блоки разделяемой памяти
+
+        :param blocks: список блоков
+        """
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    def start(self) -> None:
+        """Опубликовать матрицу и запустить процессы шардов (после load_data)"""
+        spec, _ = self._publish()
+        context = mp.get_context("fork")
+        for shard in range(self.num_shards):
+            parent_end, worker_end = context.Pipe()
+            worker = context.Process(target=_shard_worker, args=(worker_end, shard, spec), daemon=True)
+            worker.start()
+            worker_end.close()
+            self._workers.append(worker)
+            self._connections.append(parent_end)
+        print(f"Запущено {self.num_shards} шардов пользователей")
+
+    def refresh(self) -> None:
+        """Переопубликовать матрицу, если версия данных изменилась (например, после слияния буфера)"""
+        with self._lock:
+            if self.version == self.dp.data_version:
+                return
+            spec, old_blocks = self._publish()
+            for connection in self._connections:
+                connection.send(("attach", spec))
+            for connection in self._connections:
+                connection.recv()
+            self._release(old_blocks)
+
+    def is_usable(self) -> bool:
+        """
+        Можно ли отвечать из шардов: только в процессе-владельце и без несмёрженных изменений
+
+        Оценки из буфера изменений в шарды не попадают, поэтому до слияния
+        поиск выполняется локально.
+
+        :return: True, если шарды содержат актуальные данные
+        """
+        return (bool(self._workers) and os.getpid() == self._owner_pid
+                and not self.dp.rating_store.delta_rows)
+
+    def find_neighbours(self, virtual_user_ratings: dict, num_neighbours: int = 20, exclude_rows: list = ()) -> tuple:
+        """
+        Поиск соседей во всех шардах со слиянием локальных top-k
+
+        :param virtual_user_ratings: словарь виртуального пользователя
+        :param num_neighbours: количество соседей
+        :param exclude_rows: строки пользователей, исключаемые из соседей
+        :return: кортеж (строки соседей, их сходства) по убыванию сходства
+        """
+        if self.version != self.dp.data_version:
+            self.refresh()
+
+        movie_index = self.dp.rating_store.movie_index
+        rated = [(movie_index[movie_id], rating) for movie_id, rating in virtual_user_ratings.items()
+                 if movie_id in movie_index and movie_index[movie_id] < self.n_movies]
+        cols = np.array([col for col, _ in rated], dtype=np.int64)
+        ratings = np.array([rating for _, rating in rated], dtype=np.float64)
+        payload = (cols, ratings, np.asarray(exclude_rows, dtype=np.int64), num_neighbours)
+
+        with self._lock:
+            for connection in self._connections:
+                connection.send(("query", payload))
+            results = [connection.recv() for connection in self._connections]
+
+        rows = np.concatenate([shard_rows for shard_rows, _ in results])
+        similarities = np.concatenate([shard_sims for _, shard_sims in results])
+        order = np.argsort(rows, kind='stable')
+        return select_top_neighbours(rows[order], similarities[order], num_neighbours)
+
+    def close(self) -> None:
+        """Остановить процессы шардов и освободить разделяемую память"""
+        if os.getpid() != self._owner_pid:
+            return
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers, self._connections = [], []
+        self._release(self._blocks)
+        self._blocks = []
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 def cosine_similarity(user1_ratings: dict, user2_ratings: dict) -> float:
     """
@@ -33,3 +34,93 @@ def cosine_similarity(user1_ratings: dict, user2_ratings: dict) -> float:
         return 0.0
     
     return dot_product / (norm1 * norm2)
+
+
+def batch_cosine_similarity(rating_store, virtual_user_ratings: dict, min_common: int = 1) -> tuple:
+    """
+    Векторизованное косинусное сходство виртуального пользователя
+    со всеми пользователями хранилища по общим фильмам
+
+    :param rating_store: разреженное хранилище оценок RatingStore
+    :param virtual_user_ratings: словарь виртуального пользователя
+    :param min_common: сходство считается только для пользователей хотя бы с таким числом общих фильмов
+    :return: кортеж (массив сходств, массив количества общих фильмов) по строкам хранилища
+    """
+    rows_parts, real_parts, virtual_parts = [], [], []
+    for movie_id, rating in virtual_user_ratings.items():
+        col = rating_store.movie_index.get(movie_id)
+        if col is None:
+            continue
+        rows, real = rating_store.column_entries(col)
+        rows_parts.append(rows)
+        real_parts.append(real)
+        virtual_parts.append(np.full(len(rows), rating, dtype=np.float64))
+
+    if not rows_parts:
+        return _pairs_cosine_similarity(
+            np.empty(0, dtype=np.int32), np.empty(0), np.empty(0), rating_store.n_users
+        )
+
+    return _pairs_cosine_similarity(
+        np.concatenate(rows_parts),
+        np.concatenate(virtual_parts),
+        np.concatenate(real_parts).astype(np.float64),
+        rating_store.n_users,
+        min_common
+    )
+
+
+def _pairs_cosine_similarity(rows: np.ndarray, virtual: np.ndarray, real: np.ndarray, n_users: int,
+                             min_common: int = 1) -> tuple:
+    """
+    Свёртка пар общих оценок в косинусное сходство по пользователям
+
+    Сначала считается число общих фильмов, и пары пользователей, у которых их меньше
+    min_common, отбрасываются до взвешенных сумм. Порядок оставшихся пар не меняется,
+    поэтому их сходства совпадают с расчётом без фильтра бит в бит.
+
+    :param rows: строка пользователя для каждой пары
+    :param virtual: оценка виртуального пользователя в паре
+    :param real: оценка реального пользователя в паре
+    :param n_users: количество пользователей в хранилище
+    :param min_common: минимальное число общих фильмов, у остальных сходство 0
+    :return: кортеж (массив сходств, массив количества общих фильмов)
+    """
+    common_counts = np.bincount(rows, minlength=n_users)
+    if min_common > 1:
+        keep = common_counts[rows] >= min_common
+        rows, virtual, real = rows[keep], virtual[keep], real[keep]
+
+    dot_product = np.bincount(rows, weights=virtual * real, minlength=n_users)
+    norm1_squared = np.bincount(rows, weights=virtual * virtual, minlength=n_users)
+    norm2_squared = np.bincount(rows, weights=real * real, minlength=n_users)
+
+    similarities = np.zeros(n_users)
+    nonzero = (norm1_squared > 0) & (norm2_squared > 0)
+    similarities[nonzero] = dot_product[nonzero] / (
+        np.sqrt(norm1_squared[nonzero]) * np.sqrt(norm2_squared[nonzero])
+    )
+    return similarities, common_counts
+
+
+def select_top_neighbours(rows: np.ndarray, similarities: np.ndarray, k: int) -> tuple:
+    """
+    Выбор k самых похожих пользователей без полной сортировки
+
+    При равном сходстве на границе выбираются пользователи с меньшим номером строки.
+
+    :param rows: номера строк пользователей-кандидатов по возрастанию
+    :param similarities: сходство кандидатов с виртуальным пользователем
+    :param k: количество соседей
+    :return: кортеж (строки соседей, их сходства) по убыванию сходства
+    """
+    if len(rows) > k:
+        top = np.argpartition(-similarities, k - 1)[:k]
+        boundary = similarities[top].min()
+        above = np.flatnonzero(similarities > boundary)
+        tied = np.flatnonzero(similarities == boundary)[:k - len(above)]
+        top = np.concatenate([above, tied])
+        rows, similarities = rows[top], similarities[top]
+
+    order = np.lexsort((rows, -similarities))
+    return rows[order], similarities[order]
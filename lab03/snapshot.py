@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from movie_catalog import MovieCatalog
+from rating_store import RatingStore
+
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+RATING_COLUMNS = ['user_id', 'movie_id', 'rating', 'timestamp']
+
+def _file_hash(path: str) -> str:
+    """
+    SHA-256 содержимого файла
+
+    :param path: путь к файлу
+    :return: hex-строка хеша
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _fingerprint(path: str) -> dict:
+    """
+    Отпечаток исходного файла для проверки актуальности снимка
+
+    :param path: путь к файлу
+    :return: словарь с размером, временем изменения и хешем или None, если файла нет
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _file_hash(path)}
+
+def _is_fresh(recorded: dict, path: str) -> bool:
+    """
+    Проверка, что исходный файл не изменился с момента создания снимка
+
+    Сначала сравниваются размер и mtime, хеш считается только если mtime
+    отличается (например, после копирования файла без изменений).
+
+    :param recorded: отпечаток из манифеста
+    :param path: путь к файлу
+    :return: True, если файл совпадает со снимком
+    """
+    if recorded is None or not os.path.exists(path):
+        return recorded is None and not os.path.exists(path)
+    stat = os.stat(path)
+    if stat.st_size != recorded["size"]:
+        return False
+    if stat.st_mtime_ns == recorded["mtime_ns"]:
+        return True
+    return _file_hash(path) == recorded["sha256"]
+
+def save_snapshot(data_processor, snapshot_dir: str, source_paths: list) -> None:
+    """
+    Сохранить разобранные данные и индексы в каталог снимка
+
+    Каждый массив пишется отдельным .npy, чтобы его можно было отобразить в память.
+    Снимок собирается во временном каталоге процесса рядом с snapshot_dir и
+    подменяется переименованием, поэтому несколько воркеров не мешают друг другу.
+
+    :param data_processor: обработчик данных с загруженным датасетом
+    :param snapshot_dir: каталог снимка
+    :param source_paths: исходные файлы, по которым проверяется актуальность
+    """
+    store = data_processor.rating_store
+    catalog = data_processor.movie_catalog
+    encoded_titles = [title.encode('utf-8') for title in catalog.titles]
+
+    arrays = {name: getattr(store, name) for name in RatingStore.ARRAYS}
+    arrays.update({f"ratings_{column}": data_processor.ratings_df[column].to_numpy() for column in RATING_COLUMNS})
+    arrays.update({
+        "catalog_movie_ids": catalog.movie_ids,
+        "catalog_genre_bits": catalog.genre_bits,
+        "catalog_popular_movie_ids": catalog.popular_movie_ids,
+        "catalog_title_offsets": np.cumsum([0] + [len(title) for title in encoded_titles], dtype=np.int64),
+        "catalog_titles": np.frombuffer(b''.join(encoded_titles), dtype=np.uint8)
+    })
+
+    parent_dir = os.path.dirname(os.path.abspath(snapshot_dir))
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(snapshot_dir)}.", suffix=".tmp", dir=parent_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "sources": {os.path.abspath(path): _fingerprint(path) for path in source_paths},
+            "arrays": sorted(arrays)
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        old_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(snapshot_dir)}.", suffix=".old", dir=parent_dir)
+        try:
+            os.replace(snapshot_dir, old_dir)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(tmp_dir, snapshot_dir)
+        except OSError:
+            # другой воркер успел положить снимок из тех же исходных файлов
+            pass
+        shutil.rmtree(old_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def load_snapshot(data_processor, snapshot_dir: str, source_paths: list) -> bool:
+    """
+    Загрузить данные из снимка, если он актуален
+
+    Любая ошибка чтения (снимок удалён другим воркером, файл повреждён)
+    считается промахом, и данные собираются из исходных файлов.
+
+    :param data_processor: обработчик данных, в который загружаются данные
+    :param snapshot_dir: каталог снимка
+    :param source_paths: исходные файлы, по которым проверяется актуальность
+    :return: True, если снимок загружен
+    """
+    try:
+        manifest_path = os.path.join(snapshot_dir, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return False
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            return False
+        sources = manifest.get("sources", {})
+        for path in source_paths:
+            key = os.path.abspath(path)
+            if key not in sources or not _is_fresh(sources[key], path):
+                return False
+
+        arrays = {
+            name: np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode='r') for name in manifest["arrays"]
+        }
+
+        data_processor.ratings_df = pd.DataFrame(
+            {column: arrays[f"ratings_{column}"] for column in RATING_COLUMNS},
+            copy=False
+        )
+        data_processor.rating_store = RatingStore.from_arrays(arrays)
+
+        offsets = arrays["catalog_title_offsets"]
+        titles_blob = arrays["catalog_titles"].tobytes()
+        titles = [titles_blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        data_processor.movie_catalog = MovieCatalog.from_arrays(
+            arrays["catalog_movie_ids"],
+            titles,
+            arrays["catalog_genre_bits"],
+            arrays["catalog_popular_movie_ids"]
+        )
+        return True
+    except Exception as e:
+        print(f"Ошибка загрузки снимка данных, данные будут загружены заново: {e}")
+        return False